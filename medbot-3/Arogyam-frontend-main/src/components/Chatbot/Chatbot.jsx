@@ -30,7 +30,7 @@ function Chatbot() {
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
 
-  const BASE_URL = "http://127.0.0.1:8000/chat"; // FastAPI backend
+  const BASE_URL = "http://127.0.0.1:8000/chat/stream"; // FastAPI backend (NDJSON stream)
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -68,15 +68,44 @@ function Chatbot() {
         }),
       });
 
-      const data = await res.json();
+      // Reply arrives as NDJSON: {"delta": "..."} lines, then {"done": true}
+      const aiId = Date.now() + 1;
+      setMessages((prev) => [
+        ...prev,
+        { id: aiId, text: "", isUser: false, timestamp: new Date() },
+      ]);
 
-      const aiResponse = {
-        id: Date.now() + 1,
-        text: data.reply || "⚠️ No response from server.",
-        isUser: false,
-        timestamp: new Date(),
-      };
-      setMessages((prev) => [...prev, aiResponse]);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let received = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (!event.delta) continue;
+          received = true;
+          setIsTyping(false);
+          setMessages((prev) =>
+            prev.map((m) =>
+              m.id === aiId ? { ...m, text: m.text + event.delta } : m
+            )
+          );
+        }
+      }
+
+      if (!received) {
+        setMessages((prev) =>
+          prev.map((m) =>
+            m.id === aiId ? { ...m, text: "⚠️ No response from server." } : m
+          )
+        );
+      }
     } catch (error) {
       const errorResponse = {
         id: Date.now() + 1,
@@ -0,0 +1,3 @@
+# bench/
+# Offline evaluation / benchmark scripts. Each one is a CLI module run from
+# the Backend directory, e.g. python -m bench.quantization --help
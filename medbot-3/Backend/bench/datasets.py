@@ -0,0 +1,34 @@
+# bench/datasets.py
+"""Shared dataset helpers for the bench scripts."""
+import os
+import json
+import random
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+MASTER_DATASET = os.path.join(DATA_DIR, "master_dataset.json")
+
+
+def load_rows(path: str = MASTER_DATASET):
+    with open(path, "r", encoding="utf-8") as f:
+        return [r for r in json.load(f) if r.get("query")]
+
+
+def held_out_split(rows, n: int = 300, seed: int = 13):
+    """(corpus, held_out): a seeded sample of `n` rows is held out as queries."""
+    rng = random.Random(seed)
+    picked = set(rng.sample(range(len(rows)), min(n, len(rows))))
+    corpus = [r for i, r in enumerate(rows) if i not in picked]
+    held_out = [r for i, r in enumerate(rows) if i in picked]
+    return corpus, held_out
+
+
+def entity_values(row) -> tuple:
+    return tuple(sorted(str(e.get("value", "")).lower() for e in row.get("entities") or []))
+
+
+def encode(texts, model_name: str = None, batch_size: int = 64):
+    """Unit-normalized float32 embeddings from the shared model registry."""
+    from db.embeddings import get_model
+    return get_model(model_name).encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                                        normalize_embeddings=True, show_progress_bar=False)
@@ -0,0 +1,89 @@
+# bench/intent_router.py
+"""
+Accuracy and latency of the embedding intent router (chatbot/intent_router.py).
+
+Centroids are built from the training split of master_dataset.json only;
+the held-out queries are then classified. Reports intent accuracy, table
+accuracy (what routing actually needs), coverage at INTENT_MIN_MARGIN
+(share routed in one step rather than falling back to the fan-out) and
+the accuracy of those routed messages, next to the keyword lists the
+router replaced. Latency is split into encode time and classify time.
+
+    python -m bench.intent_router [--held-out 500] [--margin 0.02]
+"""
+import sys
+import time
+import argparse
+import numpy as np
+
+from bench.datasets import load_rows, held_out_split, encode
+from chatbot.intent_router import IntentRouter, INTENT_TABLES, INTENT_SAMPLES_PER_LABEL, INTENT_MIN_MARGIN
+from chatbot.utils import normalize_text
+
+# The substring lists MedAgent used before the router, for comparison
+KEYWORD_SCHEME = ["scheme", "yojana", "pm-jay", "eligibility", "insurance", "coverage"]
+KEYWORD_SYMPTOM = ["fever", "bukhar", "dard", "pain", "thakan", "fatigue", "khansi", "cough", "symptom", "headache"]
+
+
+def keyword_table(text: str) -> str:
+    msg = normalize_text(text)
+    if any(w in msg for w in KEYWORD_SCHEME):
+        return "schemes"
+    if any(w in msg for w in KEYWORD_SYMPTOM):
+        return "symptoms"
+    return "faqs"
+
+
+def evaluate(train, held_out, margin: float, samples: int, model_name: str = None):
+    start = time.perf_counter()
+    router = IntentRouter.from_rows(train, lambda texts: encode(texts, model_name), samples)
+    build_s = time.perf_counter() - start
+
+    texts = [normalize_text(r["query"]) for r in held_out]
+    start = time.perf_counter()
+    embeddings = encode(texts, model_name, batch_size=1)
+    encode_ms = 1000 * (time.perf_counter() - start) / len(texts)
+
+    start = time.perf_counter()
+    predictions = [router.classify(e) for e in embeddings]
+    classify_us = 1e6 * (time.perf_counter() - start) / len(texts)
+
+    intents = [r["intent"] for r in held_out]
+    tables = [INTENT_TABLES.get(i, "faqs") for i in intents]
+    routed = [(p, t) for p, t in zip(predictions, tables) if p[3] >= margin]
+    return {
+        "labels": len(router.labels),
+        "build_s": build_s,
+        "intent_accuracy": np.mean([p[0] == i for p, i in zip(predictions, intents)]),
+        "table_accuracy": np.mean([p[1] == t for p, t in zip(predictions, tables)]),
+        "coverage": len(routed) / len(held_out),
+        "routed_accuracy": np.mean([p[1] == t for p, t in routed]) if routed else float("nan"),
+        "keyword_table_accuracy": np.mean([keyword_table(r["query"]) == t for r, t in zip(held_out, tables)]),
+        "encode_ms": encode_ms,
+        "classify_us": classify_us,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the embedding intent router.")
+    parser.add_argument("--held-out", type=int, default=500)
+    parser.add_argument("--margin", type=float, default=INTENT_MIN_MARGIN)
+    parser.add_argument("--samples", type=int, default=INTENT_SAMPLES_PER_LABEL, help="queries per intent centroid")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--model", default=None, help="defaults to EMB_MODEL")
+    args = parser.parse_args(argv)
+
+    train, held_out = held_out_split(load_rows(), args.held_out, args.seed)
+    report = evaluate(train, held_out, args.margin, args.samples, args.model)
+    print(f"[intent_router] {report['labels']} centroids built in {report['build_s']:.1f}s "
+          f"from {len(train)} rows; {len(held_out)} held-out queries")
+    print(f"  intent accuracy         {report['intent_accuracy']:.3f}")
+    print(f"  table accuracy          {report['table_accuracy']:.3f}  (keyword lists: {report['keyword_table_accuracy']:.3f})")
+    print(f"  routed in one step      {report['coverage']:.3f}  at margin {args.margin}")
+    print(f"  accuracy when routed    {report['routed_accuracy']:.3f}")
+    print(f"  latency                 {report['encode_ms']:.2f} ms encode + {report['classify_us']:.1f} us classify")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
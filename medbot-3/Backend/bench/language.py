@@ -0,0 +1,83 @@
+# bench/language.py
+"""
+Accuracy and per-call cost of chatbot/language.py against the `language`
+labels (en / hi / hinglish) in master_dataset.json.
+
+The lexicon is rebuilt from the training split only, so the held-out
+queries are unseen. The detector it replaced (substring word list +
+langdetect) is measured on the same queries for comparison.
+
+    python -m bench.language [--held-out 1000] [--repeat 5]
+"""
+import re
+import sys
+import time
+import argparse
+
+from bench.datasets import load_rows, held_out_split
+from chatbot.language import build_lexicon, detect_language
+
+LABELS = ("en", "hi", "hinglish")
+
+
+def legacy_detect(text: str) -> str:
+    """utils.detect_language_tight before the lexicon detector."""
+    from langdetect import detect
+    text_strip = text.strip()
+    if re.search(r"[ऀ-ॿ]", text_strip):
+        return "hi"
+    if any(w in text_strip.lower() for w in ["hai", "nahi", "acha", "kya", "kaise", "thoda", "bimari", "bukhar", "dard"]):
+        return "hinglish"
+    try:
+        return "hi" if detect(text_strip) == "hi" else "en"
+    except Exception:
+        return "en"
+
+
+def evaluate(detect, queries, labels, repeat: int = 1):
+    predictions = [detect(q) for q in queries]  # also warms lazy state (langdetect profiles)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            detect(q)
+    us = 1e6 * (time.perf_counter() - start) / (repeat * len(queries))
+    confusion = {(t, p): 0 for t in LABELS for p in LABELS}
+    for t, p in zip(labels, predictions):
+        confusion[(t, p)] = confusion.get((t, p), 0) + 1
+    accuracy = sum(t == p for t, p in zip(labels, predictions)) / len(labels)
+    return accuracy, us, confusion
+
+
+def _print(name, accuracy, us, confusion):
+    print(f"\n{name}: accuracy {accuracy:.3f}, {us:.1f} us/call")
+    print(f"  {'label':<10}" + "".join(f"{p:>10}" for p in LABELS))
+    for t in LABELS:
+        print(f"  {t:<10}" + "".join(f"{confusion[(t, p)]:>10}" for p in LABELS))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the language detector.")
+    parser.add_argument("--held-out", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="timing passes over the held-out queries")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--skip-legacy", action="store_true", help="don't run the langdetect-based detector")
+    args = parser.parse_args(argv)
+
+    train, held_out = held_out_split(load_rows(), args.held_out, args.seed)
+    lexicon = build_lexicon([{"language": r.get("language"), "texts": [r.get("query"), r.get("answer")]}
+                             for r in train])
+    queries = [r["query"] for r in held_out]
+    labels = [r.get("language") for r in held_out]
+    print(f"[language] lexicon of {len(lexicon)} words from {len(train)} rows; {len(queries)} held-out queries")
+
+    _print("lexicon detector", *evaluate(lambda q: detect_language(q, lexicon, fallback=False),
+                                         queries, labels, args.repeat))
+    _print("lexicon + langdetect fallback", *evaluate(lambda q: detect_language(q, lexicon, fallback=True),
+                                                      queries, labels, args.repeat))
+    if not args.skip_legacy:
+        _print("legacy (word list + langdetect)", *evaluate(legacy_detect, queries, labels, 1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# bench/llm_client.py
+"""
+Load test for chatbot/llm_client.py against the fake provider: many
+concurrent callers through one LLMClient, reporting throughput, latency
+percentiles, how many calls degraded (LLMError), and the client's own
+counters (retries, timeouts, breaker state).
+
+    python -m bench.llm_client [--requests 200] [--callers 50] [--latency 0.5]
+                               [--failure-rate 0.1] [--timeout 2] [--concurrency 8]
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+from chatbot.llm_client import CircuitBreaker, FakeProvider, LLMClient, LLMError, LLMUnavailable
+
+
+async def run(client: LLMClient, requests: int, callers: int):
+    latencies, errors, rejected = [], 0, 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(f"Load test prompt {i}")
+
+    async def caller():
+        nonlocal errors, rejected
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await client.acomplete(prompt)
+            except LLMUnavailable:
+                rejected += 1
+            except LLMError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return time.perf_counter() - start, np.asarray(latencies), errors, rejected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the LLM client with the fake provider.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--callers", type=int, default=50, help="concurrent callers")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake provider latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="fake transient failure rate")
+    parser.add_argument("--timeout", type=float, default=2.0, help="per-call deadline (s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    client = LLMClient(FakeProvider(args.latency, args.failure_rate), timeout=args.timeout,
+                       max_concurrency=args.concurrency, retries=args.retries,
+                       breaker=CircuitBreaker(failures=args.breaker_failures))
+    elapsed, latencies, errors, rejected = asyncio.run(run(client, args.requests, args.callers))
+
+    ok = len(latencies) - errors - rejected
+    print(f"[llm_client] {args.requests} requests, {args.callers} callers, {args.concurrency} slots, "
+          f"fake latency {args.latency}s, failure rate {args.failure_rate:.0%}, deadline {args.timeout}s")
+    print(f"  {elapsed:.2f}s total, {args.requests / elapsed:.1f} req/s")
+    print(f"  p50 {1e3 * np.percentile(latencies, 50):.0f} ms, p99 {1e3 * np.percentile(latencies, 99):.0f} ms, "
+          f"max {1e3 * latencies.max():.0f} ms")
+    print(f"  ok {ok}, failed {errors}, rejected by open circuit {rejected}")
+    print(f"  client: {client.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# bench/onnx_encoder.py
+"""
+Parity and latency of the ONNX Runtime embedding backend (db/onnx_encoder.py)
+against the torch SentenceTransformer it was exported from.
+
+    parity   cosine between torch and ONNX embeddings of a seeded sample
+             of dataset queries and answers; exits 1 if any text falls
+             below --min-cosine (default 0.99)
+    latency  p50/p99 of single-query encode() (one query per request, as
+             in the API) for torch, ONNX float32 and ONNX int8
+
+    python -m bench.onnx_encoder [--model NAME] [--dir DIR] [--texts 1000] [--queries 300]
+                                 [--threads 0] [--max-seq-length 0] [--min-cosine 0.99]
+
+Run `python -m db.onnx_encoder export` first.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+from bench.datasets import load_rows
+from db.embeddings import EMB_MODEL, get_model
+from db.onnx_encoder import FP32_FILE, INT8_FILE, OnnxEncoder, model_dir
+
+
+def sample_texts(rows, n: int, seed: int = 13):
+    texts = [r["query"] for r in rows] + [r["answer"] for r in rows if r.get("answer")]
+    return random.Random(seed).sample(texts, min(n, len(texts)))
+
+
+def latencies(model, queries, warmup: int = 10) -> np.ndarray:
+    for q in queries[:warmup]:
+        model.encode(q, normalize_embeddings=True)
+    out = []
+    for q in queries:
+        start = time.perf_counter()
+        model.encode(q, normalize_embeddings=True)
+        out.append(time.perf_counter() - start)
+    return 1e3 * np.asarray(out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ONNX vs torch embedding parity and latency.")
+    parser.add_argument("--model", default=EMB_MODEL)
+    parser.add_argument("--dir", default=None, help="export directory (default: db.onnx_encoder.model_dir)")
+    parser.add_argument("--texts", type=int, default=1000, help="texts for the parity check")
+    parser.add_argument("--queries", type=int, default=300, help="single-query encodes per backend")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for both runtimes (0 = default)")
+    parser.add_argument("--max-seq-length", type=int, default=0, help="token limit for both (0 = model's own)")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    path = args.dir or model_dir(args.model)
+    rows = load_rows()
+    texts = sample_texts(rows, args.texts, args.seed)
+    queries = [r["query"] for r in random.Random(args.seed + 1).sample(rows, min(args.queries, len(rows)))]
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    reference = get_model(args.model, backend="torch")
+    if args.max_seq_length:
+        reference.max_seq_length = args.max_seq_length
+    backends = {"torch": reference}
+    for label, file, quantized in (("onnx float32", FP32_FILE, False), ("onnx int8", INT8_FILE, True)):
+        if os.path.isfile(os.path.join(path, file)):
+            backends[label] = OnnxEncoder(path, quantized=quantized, intra_op_threads=args.threads,
+                                          max_seq_length=args.max_seq_length or reference.max_seq_length)
+    if len(backends) == 1:
+        print(f"[onnx] No export in {path}; run `python -m db.onnx_encoder export`")
+        return 1
+
+    print(f"[onnx] {args.model} from {path}; {len(texts)} parity texts, {len(queries)} latency queries, "
+          f"threads={args.threads or 'default'}, max_seq_length={args.max_seq_length or reference.max_seq_length}")
+
+    failed = False
+    expected = reference.encode(texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False)
+    print(f"\n  {'parity':<14} {'min cos':>9} {'p1 cos':>9} {'mean cos':>9} {'< min':>7}")
+    for label, model in backends.items():
+        if label == "torch":
+            continue
+        cos = (model.encode(texts, batch_size=32, normalize_embeddings=True) * expected).sum(axis=1)
+        below = int((cos < args.min_cosine).sum())
+        failed |= below > 0
+        print(f"  {label:<14} {cos.min():>9.4f} {np.percentile(cos, 1):>9.4f} {cos.mean():>9.4f} {below:>7}")
+
+    print(f"\n  {'latency':<14} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for label, model in backends.items():
+        ms = latencies(model, queries)
+        print(f"  {label:<14} {np.percentile(ms, 50):>9.2f} {np.percentile(ms, 99):>9.2f} {ms.mean():>9.2f}")
+
+    print(f"\n[onnx] parity {'FAILED' if failed else 'ok'} (min cosine {args.min_cosine})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# bench/quantization.py
+"""
+Accuracy vs memory of the vector storage options.
+
+Holds out a seeded sample of master_dataset.json queries, indexes the rest
+(query + answer, as db.load_data embeds FAQs) and compares every mode with
+exact float32 search:
+
+    float32           exact baseline (TableIndex INDEX_DTYPE=float32)
+    float16           TableIndex INDEX_DTYPE=float16 / pgvector halfvec index
+    int8              TableIndex INDEX_DTYPE=int8
+    binary            Hamming search only (pgvector binary_quantize index)
+    binary+rerank     binary candidates re-ranked by the exact inner
+                      product (VECTOR_STORAGE=binary, BINARY_RERANK)
+
+recall@k is overlap with the float32 top-k; answer@1 is the share of held-out
+queries whose top row has the same intent and entities.
+
+    python -m bench.quantization [--held-out 300] [--k 5] [--rerank 40]
+"""
+import sys
+import time
+import argparse
+import numpy as np
+
+from bench.datasets import load_rows, held_out_split, entity_values, encode
+from db.quantize import QuantizedMatrix, binary_codes, hamming, top_k
+
+
+def _binary_search(codes, q_codes, k):
+    return [np.argsort(hamming(codes, qc), kind="stable")[:k] for qc in q_codes]
+
+
+def _rerank(matrix, candidates, queries, k):
+    out = []
+    for cand, q in zip(candidates, queries):
+        out.append(cand[top_k(matrix[cand] @ q, k)])
+    return out
+
+
+def evaluate(corpus, held_out, k: int = 5, rerank: int = 40, model_name: str = None):
+    print(f"[quantization] Encoding {len(corpus)} corpus rows and {len(held_out)} queries...")
+    matrix = encode([f"{r['query']} {r.get('answer') or ''}" for r in corpus], model_name)
+    queries = encode([r["query"] for r in held_out], model_name)
+    labels = [(r.get("intent"), entity_values(r)) for r in corpus]
+    truth_labels = [(r.get("intent"), entity_values(r)) for r in held_out]
+
+    exact = [top_k(matrix @ q, k) for q in queries]
+
+    def row(mode, results, nbytes, elapsed):
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(results, exact)])
+        answer = np.mean([labels[res[0]] == t for res, t in zip(results, truth_labels)])
+        return {"mode": mode, "bytes_per_row": nbytes / len(matrix), "mb": nbytes / 1e6,
+                f"recall@{k}": recall, "answer@1": answer, "ms_per_query": 1000 * elapsed / len(queries)}
+
+    report = []
+    for dtype in ("float32", "float16", "int8"):
+        qm = QuantizedMatrix(matrix, dtype)
+        start = time.perf_counter()
+        results = [top_k(qm.scores(q), k) for q in queries]
+        report.append(row(dtype, results, qm.nbytes, time.perf_counter() - start))
+
+    codes, q_codes = binary_codes(matrix), binary_codes(queries)
+    start = time.perf_counter()
+    results = _binary_search(codes, q_codes, k)
+    report.append(row("binary", results, codes.nbytes, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    candidates = _binary_search(codes, q_codes, rerank)
+    results = _rerank(matrix, candidates, queries, k)
+    # the float vectors stay on disk in Postgres; only the bit index is memory-resident
+    report.append(row(f"binary+rerank{rerank}", results, codes.nbytes, time.perf_counter() - start))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy vs memory of quantized vector storage.")
+    parser.add_argument("--held-out", type=int, default=300, help="queries held out of the corpus")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank", type=int, default=40, help="binary candidates re-ranked")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--model", default=None, help="defaults to EMB_MODEL")
+    args = parser.parse_args(argv)
+
+    corpus, held_out = held_out_split(load_rows(), args.held_out, args.seed)
+    report = evaluate(corpus, held_out, args.k, args.rerank, args.model)
+
+    recall = f"recall@{args.k}"
+    print(f"\n{'mode':<18}{'bytes/row':>10}{'MB':>9}{recall:>11}{'answer@1':>10}{'ms/query':>10}")
+    for r in report:
+        print(f"{r['mode']:<18}{r['bytes_per_row']:>10.0f}{r['mb']:>9.2f}"
+              f"{r[recall]:>11.3f}{r['answer@1']:>10.3f}{r['ms_per_query']:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# bench/startup.py
+"""
+Cold-start cost of the API: import time of a module (main by default),
+measured in a fresh interpreter with `python -X importtime`, with the
+slowest imports by cumulative time. With --warm it also runs main's
+warm-up steps in that interpreter and prints what /ready would report.
+
+    python -m bench.startup [--module main] [--top 15] [--warm]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WARM = """
+import asyncio, json, main
+async def warm():
+    try:
+        await main.warm_up_all()
+    finally:
+        await main.close_async_pool()
+asyncio.run(warm())
+print("STARTUP " + json.dumps(main.startup))
+"""
+
+
+def import_times(module: str, warm: bool = False):
+    """([(cumulative_us, self_us, name)], stdout) for importing `module` in a fresh interpreter."""
+    code = _WARM if warm else f"import {module}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    return rows, proc.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API import and warm-up time.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--warm", action="store_true", help="also run main's warm-up (needs the DB and model)")
+    args = parser.parse_args(argv)
+
+    rows, stdout = import_times(args.module, args.warm)
+    total = next((cum for cum, _, name in rows if name.strip() == args.module), None)
+    print(f"[startup] import {args.module}: {total / 1e6:.3f}s" if total else f"[startup] {args.module}: no timing")
+    print(f"  {'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1e3:>10.1f}ms {self_us / 1e3:>8.1f}ms  {name}")
+
+    for line in stdout.splitlines():
+        if line.startswith("STARTUP "):
+            report = json.loads(line[len("STARTUP "):])
+            print(f"\n[startup] warm-up (ready={report['ready']}):")
+            for step, seconds in report["steps"].items():
+                print(f"  {step:<20} {seconds:>8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
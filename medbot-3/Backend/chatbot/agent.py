@@ -1,57 +1,277 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from chatbot import utils
-from chatbot.llm_client import ask_gemini, DISCLAIMER
+from chatbot import intent_router
+from chatbot.sessions import Session, get_session_store
+from chatbot.llm_cache import CompletionCache, completion_key
+from chatbot.thresholds import is_hit
+from chatbot.llm_client import DISCLAIMER, LLMError, get_llm
 # from chatbot.tools import faq_tool, scheme_tool, symptom_tool, risk_tool
-from chatbot import api_client as faq_tool
-from chatbot import api_client as scheme_tool
-from chatbot import api_client as symptom_tool
-from chatbot import api_client as risk_tool
+
+# "local" (default) searches in-process; "http" talks to a remote API via api_client
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "local").lower()
+
+if RETRIEVAL_BACKEND == "http":
+    from chatbot import api_client as retrieval_client
+else:
+    from chatbot import local_client as retrieval_client
+
+logger = logging.getLogger(__name__)
+
+faq_tool = retrieval_client
+scheme_tool = retrieval_client
+symptom_tool = retrieval_client
+risk_tool = retrieval_client
+
+# Fallback fan-out: tables searched concurrently when no intent matched, in
+# tie-break order. SPECULATIVE_LLM=1 starts the LLM fallback at the same time
+# (non-streaming replies only: a streamed reply starts its own LLM stream).
+FALLBACK_TABLES = [t.strip() for t in os.getenv("FALLBACK_TABLES", "faqs,risks").split(",") if t.strip()]
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "1") == "1"
+_fanout = ThreadPoolExecutor(max_workers=int(os.getenv("FANOUT_WORKERS", "8")),
+                             thread_name_prefix="agent-fanout")
+
+# Served when the LLM is down and nothing was retrieved to fall back on
+LLM_DOWN_REPLY = "Abhi main jawab nahi de pa raha hoon. Thodi der baad try karein, ya zarurat ho to doctor se consult karein."
+
+
+class LLMRequest:
+    """A prompt plus what to do without the LLM: the retrieved text and the cache key."""
+
+    __slots__ = ("prompt", "lang", "fallback", "cache_key", "embedding")
+
+    def __init__(self, prompt: str, lang: str, fallback: str = None, cache_key=None, embedding=None):
+        self.prompt = prompt
+        self.lang = lang
+        self.fallback = fallback
+        self.cache_key = cache_key
+        self.embedding = embedding
+
+
+def _text(reply: str):
+    """Route result: a finished reply, no LLM call needed."""
+    return ("text", reply)
+
+
+def _llm(prompt: str, lang: str, fallback: str = None, cache_key=None, embedding=None):
+    """
+    Route result: a prompt whose completion (plus DISCLAIMER) is the reply.
+    `fallback` (the retrieved text) is served if the LLM fails; with a
+    `cache_key` the completion goes through the completion cache.
+    """
+    return ("llm", LLMRequest(prompt, lang, fallback, cache_key, embedding))
+
+
+def _pending(future, request: LLMRequest):
+    """Route result: an LLM completion already in flight (speculative fallback)."""
+    return ("pending", (future, request))
 
 
 class MedAgent:
-    def __init__(self):
-        self.state = {}
+    def __init__(self, store=None, completions=None, llm=None):
+        # user_id -> Session; bounded, optionally shared across workers (chatbot/sessions.py)
+        self.state = store if store is not None else get_session_store()
+        # (template, doc, lang, intent) -> LLM reply for the retrieval-grounded flows
+        self.completions = completions if completions is not None else CompletionCache()
+        # Deadline-bounded, retried, circuit-broken LLM calls (chatbot/llm_client.py)
+        self.llm = llm if llm is not None else get_llm()
 
     def handle(self, message: str, user_id: str):
+        kind, payload = self._route(message, user_id)
+        if kind == "text":
+            return payload
+        if kind == "pending":
+            return self._pending_reply(*payload) + DISCLAIMER
+        reply = self._cached(payload)
+        if reply is None:
+            start = time.perf_counter()
+            try:
+                reply = self.llm.complete(payload.prompt)
+            except LLMError as e:
+                return self._degraded(payload, e) + DISCLAIMER
+            self._remember(payload, reply, time.perf_counter() - start)
+        return reply + DISCLAIMER
+
+    async def handle_async(self, message: str, user_id: str):
+        """
+        handle() for async servers: routing (DB lookups) runs in the default
+        executor, the LLM call is awaited without holding a thread.
+        """
+        loop = asyncio.get_running_loop()
+        kind, payload = await loop.run_in_executor(None, self._route, message, user_id)
+        if kind == "text":
+            return payload
+        if kind == "pending":
+            future, request = payload
+            try:
+                return await asyncio.wrap_future(future) + DISCLAIMER
+            except LLMError as e:
+                return self._degraded(request, e) + DISCLAIMER
+        reply = self._cached(payload)
+        if reply is None:
+            start = time.perf_counter()
+            try:
+                reply = await self.llm.acomplete(payload.prompt)
+            except LLMError as e:
+                return self._degraded(payload, e) + DISCLAIMER
+            self._remember(payload, reply, time.perf_counter() - start)
+        return reply + DISCLAIMER
+
+    def handle_stream(self, message: str, user_id: str):
+        """
+        Same routing as handle(), but yields the reply in chunks: LLM replies
+        token-by-token followed by DISCLAIMER, everything else in one chunk.
+        No speculative completion is started, since it could only be sent whole.
+        """
+        kind, payload = self._route(message, user_id, speculate=False)
+        if kind == "text":
+            yield payload
+            return
+        reply = self._cached(payload)
+        if reply is not None:
+            yield reply
+            yield DISCLAIMER
+            return
+        start = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in self.llm.stream(payload.prompt):
+                chunks.append(chunk)
+                yield chunk
+        except LLMError as e:
+            if not chunks:
+                yield self._degraded(payload, e)
+            else:
+                logger.warning(f"[agent] LLM stream cut short: {e}")
+        else:
+            self._remember(payload, "".join(chunks), time.perf_counter() - start)
+        yield DISCLAIMER
+
+    async def handle_stream_async(self, message: str, user_id: str):
+        """handle_stream() for async servers; see handle_async()."""
+        loop = asyncio.get_running_loop()
+        kind, payload = await loop.run_in_executor(None, self._route, message, user_id, False)
+        if kind == "text":
+            yield payload
+            return
+        reply = self._cached(payload)
+        if reply is not None:
+            yield reply
+            yield DISCLAIMER
+            return
+        start = time.perf_counter()
+        chunks = []
+        try:
+            async for chunk in self.llm.astream(payload.prompt):
+                chunks.append(chunk)
+                yield chunk
+        except LLMError as e:
+            if not chunks:
+                yield self._degraded(payload, e)
+            else:
+                logger.warning(f"[agent] LLM stream cut short: {e}")
+        else:
+            self._remember(payload, "".join(chunks), time.perf_counter() - start)
+        yield DISCLAIMER
+
+    # ---------------- LLM replies ----------------
+    def _pending_reply(self, future, request: LLMRequest) -> str:
+        try:
+            return future.result()
+        except LLMError as e:
+            return self._degraded(request, e)
+
+    def _cached(self, request: LLMRequest):
+        if request.cache_key is None:
+            return None
+        return self.completions.get(request.cache_key, request.embedding)
+
+    def _remember(self, request: LLMRequest, reply: str, seconds: float):
+        if request.cache_key is not None:
+            self.completions.put(request.cache_key, reply, seconds, request.embedding)
+
+    def _degraded(self, request: LLMRequest, error: Exception) -> str:
+        """Reply without the LLM: the retrieved text, or a canned apology."""
+        logger.warning(f"[agent] LLM unavailable, answering from retrieval: {error}")
+        return utils.format_response(request.fallback or LLM_DOWN_REPLY, request.lang)
+
+    def _route(self, message: str, user_id: str, speculate: bool = True):
         msg_norm = utils.normalize_text(message)
         lang = utils.detect_language_tight(message)
 
         # --- Greeting ---
         if msg_norm in ["hi", "hello", "hey", "namaste", "hola"]:
-            return utils.format_response(
+            return _text(utils.format_response(
                 "Hello 👋, I'm Arogyam. Aap mujhe apne symptoms bata sakte ho, ya phir health schemes ke baare mein puch sakte ho.",
                 lang
-            )
+            ))
 
         # --- Continue flow (if user already in conversation) ---
-        if user_id in self.state and "awaiting" in self.state[user_id]:
-            return self._continue_flow(message, user_id, lang)
+        session = self.state.get(user_id)
+        if session is not None and session.awaiting:
+            return self._continue_flow(message, user_id, lang, session)
 
-        # --- Intent classification ---
-        if any(word in msg_norm for word in ["scheme", "yojana", "pm-jay", "eligibility", "insurance", "coverage"]):
-            return self._handle_scheme(message, msg_norm, lang)
+        # --- Intent classification (nearest centroid on the query embedding) ---
+        # Without an embedding the router falls back to keywords and the
+        # fan-out's searches encode (or go lexical-only) on their own
+        try:
+            embedding = retrieval_client.embed_query(msg_norm)
+        except Exception as e:
+            logger.warning(f"[agent] Query embedding failed, routing by keyword: {e}")
+            embedding = None
+        intent, table = intent_router.classify(msg_norm, embedding, encode=False)
 
-        if any(word in msg_norm for word in ["fever", "bukhar", "dard", "pain", "thakan", "fatigue", "khansi", "cough", "symptom", "headache"]):
-            return self._handle_symptom(message, msg_norm, user_id, lang)
+        if table == "schemes":
+            return self._handle_scheme(message, msg_norm, lang, intent, embedding)
 
-        # --- FAQ + Risk fallback ---
-        faq_hits = faq_tool.search_faq(msg_norm) or []
-        if faq_hits:
-            return utils.format_response(faq_hits[0][1], lang)
+        if table == "symptoms":
+            return self._handle_symptom(message, msg_norm, user_id, lang, intent, embedding)
 
-        risk_hits = risk_tool.search_risk(msg_norm) or []
-        if risk_hits:
-            return utils.format_response(risk_hits[0][1], lang)
+        if table == "faqs":
+            return self._fallback(message, msg_norm, lang, embedding, ["faqs"], speculate)
 
-        # --- Pure LLM fallback ---
+        # --- Unsure: FAQ + Risk fallback (concurrent), LLM speculatively in parallel ---
+        return self._fallback(message, msg_norm, lang, embedding, speculate=speculate)
+
+    # ---------------- Fallback fan-out ----------------
+    def _fallback(self, message: str, msg_norm: str, lang: str, embedding=None, tables=None,
+                  speculate: bool = True):
         lang_instruction = self._lang_instruction(lang)
-        return ask_gemini(
+        prompt = (
             f"You are a medical assistant. User said: {message}. "
             f"{lang_instruction} Give a helpful, safe, friendly reply."
-        ) + DISCLAIMER
+        )
+        speculative = self.llm.submit(prompt) if SPECULATIVE_LLM and speculate else None
+
+        futures = [
+            (table, _fanout.submit(retrieval_client.search_scored, table, msg_norm, embedding, lang))
+            for table in (tables or FALLBACK_TABLES)
+        ]
+
+        # Best hit across tables that clears its own table's threshold
+        best = None
+        for table, fut in futures:
+            for text, similarity in fut.result() or []:
+                if text and is_hit(table, similarity) and (best is None or similarity > best[1]):
+                    best = (text, similarity)
+
+        if best:
+            if speculative is not None:
+                # Cancels the call on the LLM client's loop, freeing its slot
+                speculative.cancel()
+            return _text(utils.format_response(best[0], lang))
+
+        # --- Pure LLM fallback ---
+        if speculative is not None:
+            return _pending(speculative, LLMRequest(prompt, lang))
+        return _llm(prompt, lang)
 
     # ---------------- Scheme flow ----------------
-    def _handle_scheme(self, message: str, msg_norm: str, lang: str):
-        scheme_hits = scheme_tool.search_scheme(msg_norm) or []
+    def _handle_scheme(self, message: str, msg_norm: str, lang: str, intent: str = None, embedding=None):
+        scheme_hits = scheme_tool.search_scheme(msg_norm, lang) or []
         if scheme_hits:
             scheme_text = scheme_hits[0][1]
             lang_instruction = self._lang_instruction(lang)
@@ -68,16 +288,18 @@ class MedAgent:
             - Mention main benefits (insurance cover, free medicines, cashless treatment).
             - Keep tone supportive and user-friendly.
             """
-            return ask_gemini(prompt) + DISCLAIMER
+            return _llm(prompt, lang, fallback=scheme_text,
+                        cache_key=completion_key("scheme", scheme_text, lang, intent), embedding=embedding)
 
-        return utils.format_response("Mujhe is scheme ki info nahi mili.", lang)
+        return _text(utils.format_response("Mujhe is scheme ki info nahi mili.", lang))
 
     # ---------------- Symptom flow ----------------
-    def _handle_symptom(self, message: str, msg_norm: str, user_id: str, lang: str):
-        sym_hits = symptom_tool.search_symptom(msg_norm) or []
+    def _handle_symptom(self, message: str, msg_norm: str, user_id: str, lang: str,
+                        intent: str = None, embedding=None):
+        sym_hits = symptom_tool.search_symptom(msg_norm, lang) or []
         if sym_hits:
             fact_text = sym_hits[0][1]
-            self.state[user_id] = {"last_fact": fact_text, "awaiting": "duration", "lang": lang}
+            self.state.put(user_id, Session(last_fact=fact_text, awaiting="duration", lang=lang))
 
             lang_instruction = self._lang_instruction(lang)
             prompt = f"""
@@ -90,34 +312,35 @@ class MedAgent:
             - Keep it short and caring.
             - End by asking: "Ye problem kab se hai? (e.g. '3 din se')"
             """
-            return ask_gemini(prompt) + DISCLAIMER
+            return _llm(prompt, lang, fallback=f"{fact_text}\n\nYe problem kab se hai? (e.g. '3 din se')",
+                        cache_key=completion_key("symptom", fact_text, lang, intent), embedding=embedding)
 
-        return utils.format_response("Mujhe is symptom ki info nahi mili.", lang)
+        return _text(utils.format_response("Mujhe is symptom ki info nahi mili.", lang))
 
     # ---------------- Continue follow-ups ----------------
-    def _continue_flow(self, message: str, user_id: str, lang: str):
-        st = self.state[user_id]
-
-        if st["awaiting"] == "duration":
-            st["duration"] = message
-            st["awaiting"] = "severity"
-            return utils.format_response("Severity kaisi hai? (mild / moderate / severe)", lang)
-
-        elif st["awaiting"] == "severity":
-            st["severity"] = message
-            st["awaiting"] = "symptoms"
-            return utils.format_response("Aur koi symptoms hai? (jaise cough, body pain, nausea?)", lang)
-
-        elif st["awaiting"] == "symptoms":
-            st["extra_symptoms"] = message
-            fact_text = st.get("last_fact", "user’s health issue")
-            duration = st.get("duration", "?")
-            severity = st.get("severity", "?")
-            extra = st.get("extra_symptoms", "not specified")
-            lang = st.get("lang", "en")
+    def _continue_flow(self, message: str, user_id: str, lang: str, st: Session):
+        if st.awaiting == "duration":
+            st.duration = message
+            st.awaiting = "severity"
+            self.state.put(user_id, st)
+            return _text(utils.format_response("Severity kaisi hai? (mild / moderate / severe)", lang))
+
+        elif st.awaiting == "severity":
+            st.severity = message
+            st.awaiting = "symptoms"
+            self.state.put(user_id, st)
+            return _text(utils.format_response("Aur koi symptoms hai? (jaise cough, body pain, nausea?)", lang))
+
+        elif st.awaiting == "symptoms":
+            st.extra_symptoms = message
+            fact_text = st.last_fact or "user’s health issue"
+            duration = st.duration or "?"
+            severity = st.severity or "?"
+            extra = st.extra_symptoms or "not specified"
+            lang = st.lang or "en"
 
             # ✅ Always clear state before final reply
-            del self.state[user_id]
+            self.state.delete(user_id)
 
             lang_instruction = self._lang_instruction(lang)
             prompt = f"""
@@ -135,11 +358,11 @@ class MedAgent:
             - Provide safe advice (home remedies + when to consult doctor).
             - Keep reply short (3–4 lines), empathetic and clear.
             """
-            return ask_gemini(prompt) + DISCLAIMER
+            return _llm(prompt, lang, fallback=fact_text)
 
         # ✅ Reset if mismatch
-        del self.state[user_id]
-        return utils.format_response("Mujhe samajh nahi aaya.", lang)
+        self.state.delete(user_id)
+        return _text(utils.format_response("Mujhe samajh nahi aaya.", lang))
 
     # ---------------- Language lock ----------------
     def _lang_instruction(self, lang: str) -> str:
@@ -1,47 +1,67 @@
+# chatbot/api_client.py
+# Remote-backend mode: talks to a separately deployed Arogyam API over HTTP.
+# Only used when RETRIEVAL_BACKEND=http (see chatbot/agent.py).
+import os
 import requests
+from chatbot.thresholds import is_hit
 
-BASE_URL = "http://127.0.0.1:8000"  # FastAPI backend ka URL
+BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")  # FastAPI backend ka URL
 
-def search_faq(query: str):
+ENDPOINTS = {"faqs": "faq", "schemes": "schemes", "symptoms": "symptoms", "risks": "risks"}
+ANSWER_FIELDS = {"faqs": "answer", "schemes": "purpose", "symptoms": "answer", "risks": "answer"}
+
+def _scored(table: str, query: str, lang: str = None):
+    """[(text, similarity)] from the endpoint's scored top-k results, best first."""
+    # "all" stops the server from guessing a language of its own
+    params = {"query": query, "lang": lang or "all"}
+    r = requests.get(f"{BASE_URL}/{ENDPOINTS[table]}", params=params, timeout=10)
+    if r.status_code != 200:
+        return []
+    field = ANSWER_FIELDS[table]
+    # results come in fused (RRF) order
+    scored = [(x[field], float(x["similarity"])) for x in r.json().get("results", []) if x.get(field)]
+    return sorted(scored, key=lambda s: s[1], reverse=True)
+
+def _hits(table: str, query: str, lang: str = None):
+    # Hit/miss is decided here from the scores, against the agent's thresholds
+    return [(query, text, sim) for text, sim in _scored(table, query, lang) if is_hit(table, sim)]
+
+def search_faq(query: str, lang: str = None):
     try:
-        r = requests.get(f"{BASE_URL}/faq", params={"query": query}, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if data.get("answer"):
-                return [(query, data["answer"])]
+        return _hits("faqs", query, lang)
     except Exception as e:
         print("FAQ API error:", e)
     return []
 
-def search_scheme(query: str):
+def search_scheme(query: str, lang: str = None):
     try:
-        r = requests.get(f"{BASE_URL}/schemes", params={"query": query}, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if "results" in data and data["results"]:
-                return [(query, data["results"][0]["purpose"])]
+        return _hits("schemes", query, lang)
     except Exception as e:
         print("Scheme API error:", e)
     return []
 
-def search_symptom(query: str):
+def search_symptom(query: str, lang: str = None):
     try:
-        r = requests.get(f"{BASE_URL}/symptoms", params={"query": query}, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if data.get("answer"):
-                return [(query, data["answer"])]
+        return _hits("symptoms", query, lang)
     except Exception as e:
         print("Symptom API error:", e)
     return []
 
-def search_risk(query: str):
+def search_risk(query: str, lang: str = None):
     try:
-        r = requests.get(f"{BASE_URL}/risks", params={"query": query}, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if data.get("answer"):
-                return [(query, data["answer"])]
+        return _hits("risks", query, lang)
     except Exception as e:
         print("Risk API error:", e)
     return []
+
+# ---------------- Scored lookups (agent fan-out) ----------------
+def embed_query(query: str):
+    # The remote API embeds server-side; nothing to share across calls here
+    return None
+
+def search_scored(table: str, query: str, embedding=None, lang: str = None):
+    try:
+        return _scored(table, query, lang)
+    except Exception as e:
+        print(f"{table} API error:", e)
+    return []
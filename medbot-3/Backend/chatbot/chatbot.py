@@ -7,3 +7,12 @@ class MedChatbot:
 
     def handle_message(self, message: str, user_id: str):
         return self.agent.handle(message, user_id)
+
+    def stream_message(self, message: str, user_id: str):
+        return self.agent.handle_stream(message, user_id)
+
+    async def handle_message_async(self, message: str, user_id: str):
+        return await self.agent.handle_async(message, user_id)
+
+    def stream_message_async(self, message: str, user_id: str):
+        return self.agent.handle_stream_async(message, user_id)
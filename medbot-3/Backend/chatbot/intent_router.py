@@ -0,0 +1,180 @@
+# chatbot/intent_router.py
+"""
+Embedding-based intent router for MedAgent.
+
+Each `intent` label in master_dataset.json gets a centroid: the normalized
+mean embedding of (up to INTENT_SAMPLES_PER_LABEL) of its queries. A
+message is classified by one dot product against the centroids, using
+the query embedding the agent computes for retrieval anyway, and its
+intent maps to the one table that answers it (INTENT_TABLES).
+
+When the best table does not beat the runner-up table by
+INTENT_MIN_MARGIN, route() returns None and the agent falls back to its
+multi-table fan-out. Without a query embedding (the encoder failed or
+timed out) classify() routes on KEYWORD_TABLES, the agent's old keyword
+lists, instead.
+
+Centroids are cached in INTENT_CENTROIDS_PATH (keyed on model, backend, dataset
+size/mtime and sample count), so only the first start pays the encode.
+python -m bench.intent_router reports accuracy and latency.
+"""
+import os
+import random
+import logging
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTENT_DATASET = os.getenv("INTENT_DATASET", os.path.join(BACKEND_DIR, "data", "master_dataset.json"))
+INTENT_CENTROIDS_PATH = os.getenv("INTENT_CENTROIDS_PATH",
+                                  os.path.join(BACKEND_DIR, "chatbot", ".intent_centroids.npz"))
+INTENT_SAMPLES_PER_LABEL = int(os.getenv("INTENT_SAMPLES_PER_LABEL", "300"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.02"))
+
+# intent label -> table that answers it
+INTENT_TABLES = {
+    "symptoms": "symptoms",
+    "causes": "faqs",
+    "prevention": "faqs",
+    "treatment": "faqs",
+    "get_scheme_info": "schemes",
+    "eligibility": "schemes",
+    "benefits": "schemes",
+    "how_to_apply": "schemes",
+}
+
+# table -> substrings that route a message there when no embedding is available
+KEYWORD_TABLES = {
+    "schemes": ("scheme", "yojana", "pm-jay", "eligibility", "insurance", "coverage"),
+    "symptoms": ("fever", "bukhar", "dard", "pain", "thakan", "fatigue", "khansi", "cough", "symptom", "headache"),
+}
+
+
+class IntentRouter:
+    """Nearest-centroid classifier over unit-normalized query embeddings."""
+
+    def __init__(self, labels, centroids):
+        self.labels = list(labels)
+        self.tables = [INTENT_TABLES.get(label, "faqs") for label in self.labels]
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+
+    @classmethod
+    def from_rows(cls, rows, encode, samples: int = INTENT_SAMPLES_PER_LABEL, seed: int = 13):
+        """Build centroids from dataset rows; `encode(texts)` returns normalized embeddings."""
+        by_label = {}
+        for r in rows:
+            if r.get("query") and r.get("intent"):
+                by_label.setdefault(r["intent"], []).append(r["query"])
+        rng = random.Random(seed)
+        labels, centroids = [], []
+        for label in sorted(by_label):
+            texts = by_label[label]
+            if len(texts) > samples:
+                texts = rng.sample(texts, samples)
+            mean = np.asarray(encode(texts), dtype=np.float32).mean(axis=0)
+            labels.append(label)
+            centroids.append(mean / max(float(np.linalg.norm(mean)), 1e-9))
+        return cls(labels, np.stack(centroids))
+
+    def classify(self, embedding):
+        """(intent, table, score, margin); margin is over the best centroid of any other table."""
+        scores = self.centroids @ np.asarray(embedding, dtype=np.float32).ravel()
+        best = int(np.argmax(scores))
+        table = self.tables[best]
+        others = [s for s, t in zip(scores, self.tables) if t != table]
+        margin = float(scores[best] - max(others)) if others else float("inf")
+        return self.labels[best], table, float(scores[best]), margin
+
+    def route(self, embedding, min_margin: float = INTENT_MIN_MARGIN):
+        """Table for this query embedding, or None when the classifier is unsure."""
+        _, table, _, margin = self.classify(embedding)
+        return table if margin >= min_margin else None
+
+    def save(self, path: str, key: str):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, labels=np.asarray(self.labels), centroids=self.centroids, key=np.asarray(key))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, key: str):
+        if not os.path.isfile(path):
+            return None
+        try:
+            data = np.load(path)
+            if str(data["key"]) != key:
+                return None
+            return cls([str(label) for label in data["labels"]], data["centroids"])
+        except Exception as e:
+            logger.warning(f"[intent_router] Ignoring unreadable centroid cache {path}: {e}")
+            return None
+
+
+def _cache_key(model_name: str, backend: str) -> str:
+    st = os.stat(INTENT_DATASET)
+    return f"{model_name}:{backend}:{st.st_size}:{int(st.st_mtime)}:{INTENT_SAMPLES_PER_LABEL}"
+
+
+_router = None
+_lock = threading.Lock()
+
+
+def get_router() -> IntentRouter:
+    """Shared router: loaded from the centroid cache, or built (and cached) on first use."""
+    global _router
+    if _router is None:
+        with _lock:
+            if _router is None:
+                import json
+                from db.embeddings import EMB_BACKEND, EMB_MODEL, get_model
+                key = _cache_key(EMB_MODEL, EMB_BACKEND)
+                router = IntentRouter.load(INTENT_CENTROIDS_PATH, key)
+                if router is None:
+                    with open(INTENT_DATASET, "r", encoding="utf-8") as f:
+                        rows = json.load(f)
+                    model = get_model()
+                    router = IntentRouter.from_rows(
+                        rows, lambda texts: model.encode(texts, batch_size=64, normalize_embeddings=True,
+                                                         show_progress_bar=False))
+                    try:
+                        router.save(INTENT_CENTROIDS_PATH, key)
+                    except OSError as e:
+                        logger.warning(f"[intent_router] Could not cache centroids: {e}")
+                    logger.info(f"[intent_router] Built {len(router.labels)} intent centroids")
+                _router = router
+    return _router
+
+
+def keyword_table(text: str):
+    """Table whose keywords occur in `text`, or None."""
+    for table, words in KEYWORD_TABLES.items():
+        if any(word in text for word in words):
+            return table
+    return None
+
+
+def classify(text: str, embedding=None, encode: bool = True):
+    """
+    (intent, table) for `text` (embedding reused when given); table is None
+    when unsure. With no embedding (and encode=False, or encoding fails)
+    the intent is None and the table comes from keyword_table().
+    """
+    try:
+        if embedding is None:
+            if not encode:
+                return None, keyword_table(text)
+            from db.embeddings import encode_query
+            embedding = encode_query(text)
+        intent, table, _, margin = get_router().classify(embedding)
+    except Exception as e:
+        logger.warning(f"[intent_router] Routing by keyword, no embedding classification: {e}")
+        return None, keyword_table(text)
+    return intent, (table if margin >= INTENT_MIN_MARGIN else None)
+
+
+def route(text: str, embedding=None):
+    """Table for `text` (embedding reused when given), or None when unsure."""
+    return classify(text, embedding)[1]
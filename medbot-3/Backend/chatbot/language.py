@@ -0,0 +1,136 @@
+# chatbot/language.py
+"""
+Fast en / hi / hinglish detection for chat messages.
+
+    1. any Devanagari character                 -> "hi"
+    2. Hinglish score >= 1 and >= HINGLISH_MIN_RATIO
+       of the Roman tokens                      -> "hinglish"
+    3. otherwise                                -> "en"
+
+The lexicon is built once, on first use, from our own data. It holds the
+words that occur in rows labelled hinglish (queries and answers in
+master_dataset.json, symptoms.json, and the schemes' _hinglish fields)
+but never in the English rows, plus a short seed list of common Roman
+Hindi words. Matching is a set lookup per whole token, so "hai" no
+longer matches inside "chai". A seed word scores 1 and a learned word
+0.5, so one learned loanword ("baby", "band") cannot make an English
+sentence Hinglish on its own.
+
+With LANG_DETECT_FALLBACK=1, Roman text with no lexicon hit also goes
+through langdetect (seeded, so it is deterministic). It is off by
+default: the script check already catches everything langdetect would
+call Hindi. python -m bench.language reports accuracy and per-call cost.
+"""
+import os
+import re
+import json
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+LEXICON_SOURCES = ("master_dataset.json", "symptoms.json", "govt.scheme.json")
+
+HINGLISH_MIN_RATIO = float(os.getenv("HINGLISH_MIN_RATIO", "0.15"))
+LANG_DETECT_FALLBACK = os.getenv("LANG_DETECT_FALLBACK", "0") == "1"
+
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+_TOKEN = re.compile(r"[a-z]+")
+
+# Frequent Roman Hindi words that a small corpus may not contain. No English
+# homographs ("pet", "sir", "din") and no two-letter particles ("ho", "se"):
+# one of those in an English sentence would be enough to score 1.
+SEED_WORDS = {
+    "hai", "hain", "nahi", "nahin", "acha", "accha", "kya", "kaise", "kaisa", "kab", "kyun", "kyu",
+    "thoda", "bahut", "bimari", "bukhar", "dard", "khansi", "thakan", "chakkar", "ulti",
+    "mujhe", "mera", "meri", "aap", "aapka", "raha", "rahi", "rahe", "gaya", "gayi",
+    "karu", "karun", "karna", "chahiye", "mein", "liye", "baare", "batao", "bataiye",
+    "kal", "aaj", "ilaj", "dawai", "dawa",
+}
+# English words the Roman Hindi side shares; never treated as Hinglish
+ENGLISH_WORDS = {
+    "a", "an", "the", "to", "me", "my", "is", "are", "am", "be", "do", "i", "in", "on", "of", "for",
+    "and", "or", "it", "he", "she", "we", "you", "they", "so", "no", "not", "hi", "hello", "ok",
+    "sir", "pet", "din", "bare", "mere", "hum",
+}
+
+
+def tokens(text: str):
+    return _TOKEN.findall(text.lower())
+
+
+def build_lexicon(rows, min_count: int = 2) -> frozenset:
+    """
+    Words seen at least `min_count` times in hinglish rows and never in en
+    rows. Each row is {"language": ..., "texts": [...]}.
+    """
+    hinglish, english = {}, set()
+    for row in rows:
+        words = [w for text in row["texts"] if text for w in tokens(text)]
+        if row["language"] == "hinglish":
+            for w in words:
+                hinglish[w] = hinglish.get(w, 0) + 1
+        elif row["language"] == "en":
+            english.update(words)
+    learned = {w for w, n in hinglish.items() if n >= min_count and w not in english}
+    return frozenset((learned | SEED_WORDS) - ENGLISH_WORDS)
+
+
+def dataset_rows(data_dir: str = DATA_DIR):
+    """Labelled text rows for build_lexicon() from our data files."""
+    rows = []
+    for name in LEXICON_SOURCES:
+        path = os.path.join(data_dir, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        for item in items:
+            if "language" in item:
+                rows.append({"language": item["language"], "texts": [item.get("query"), item.get("answer")]})
+            else:
+                # schemes: one item, one field per language
+                for lang in ("en", "hinglish"):
+                    texts = [v for k, v in item.items() if k.endswith(f"_{lang}") and isinstance(v, str)]
+                    rows.append({"language": lang, "texts": texts})
+    return rows
+
+
+_lexicon = None
+_lock = threading.Lock()
+
+
+def get_lexicon() -> frozenset:
+    global _lexicon
+    if _lexicon is None:
+        with _lock:
+            if _lexicon is None:
+                _lexicon = build_lexicon(dataset_rows())
+    return _lexicon
+
+
+def _langdetect(text: str) -> str:
+    try:
+        from langdetect import DetectorFactory, detect
+        DetectorFactory.seed = 0
+        return "hi" if detect(text) == "hi" else "en"
+    except Exception:
+        return "en"
+
+
+def detect_language(text: str, lexicon=None, fallback: bool = LANG_DETECT_FALLBACK) -> str:
+    if _DEVANAGARI.search(text):
+        return "hi"
+    words = tokens(text)
+    if not words:
+        return "en"
+    lexicon = get_lexicon() if lexicon is None else lexicon
+    hits = sum(1 for w in words if w in lexicon)
+    score = sum(1.0 if w in SEED_WORDS else 0.5 for w in words if w in lexicon)
+    if score >= 1 and score / len(words) >= HINGLISH_MIN_RATIO:
+        return "hinglish"
+    if fallback and not hits:
+        return _langdetect(text)
+    return "en"
@@ -0,0 +1,143 @@
+# chatbot/llm_cache.py
+"""
+Completion cache for MedAgent's retrieval-grounded LLM replies.
+
+The scheme and symptom flows send the LLM one fixed template filled with
+the top retrieved row. Many users asking about PM-JAY get nearly
+identical answers, so a completion is cached under
+
+    (template, retrieved doc id, language, intent)
+
+and not under the raw message text. The doc id is a hash of the
+retrieved text, so an edited row gets new entries and the old ones age
+out.
+
+With LLM_CACHE_SEMANTIC=1 a key holds up to LLM_CACHE_VARIANTS
+completions, each stored with the query embedding it answered. A lookup
+is served only when the new query embedding is within LLM_CACHE_MIN_SIM
+(cosine) of a stored one. Paraphrases share a reply, but "how to apply"
+and "who is eligible" for the same scheme do not.
+
+    LLM_CACHE_ENABLED=0                     disables the cache
+    LLM_CACHE_SIZE / LLM_CACHE_TTL          (default 2000 keys / 21600 s)
+    LLM_CACHE_SEMANTIC / LLM_CACHE_MIN_SIM  (default 0 / 0.92)
+    LLM_CACHE_VARIANTS                      (default 4)
+
+stats() reports the hit rate and the LLM seconds saved, i.e. the summed
+generation time of every served entry.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "21600"))
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+LLM_CACHE_MIN_SIM = float(os.getenv("LLM_CACHE_MIN_SIM", "0.92"))
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", "4"))
+
+
+def doc_id(text: str) -> str:
+    """Stable id for a retrieved row's text."""
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def completion_key(template: str, doc_text: str, lang: str, intent: str = None) -> tuple:
+    return (template, doc_id(doc_text), lang or "en", intent or "*")
+
+
+class _Entry:
+    __slots__ = ("text", "seconds", "embedding", "expires_at")
+
+    def __init__(self, text, seconds, embedding, expires_at):
+        self.text = text
+        self.seconds = seconds
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+class CompletionCache:
+    """Thread-safe LRU of completions per key, with per-entry expiry."""
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 semantic: bool = LLM_CACHE_SEMANTIC, min_sim: float = LLM_CACHE_MIN_SIM,
+                 variants: int = LLM_CACHE_VARIANTS, enabled: bool = LLM_CACHE_ENABLED):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.semantic = semantic
+        self.min_sim = min_sim
+        self.variants = variants
+        self.enabled = enabled
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def _vector(self, embedding):
+        if not self.semantic or embedding is None:
+            return None
+        return np.asarray(embedding, dtype=np.float32).ravel()
+
+    def get(self, key, embedding=None):
+        """Cached completion for `key` (and a near-duplicate query, in semantic mode), or None."""
+        if not self.enabled:
+            return None
+        q = self._vector(embedding)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._data.get(key)
+            if bucket:
+                bucket[:] = [e for e in bucket if e.expires_at > now]
+                for entry in bucket:
+                    if (q is None or entry.embedding is None
+                            or float(entry.embedding @ q) >= self.min_sim):
+                        self._data.move_to_end(key)
+                        self.hits += 1
+                        self.seconds_saved += entry.seconds
+                        return entry.text
+                if not bucket:
+                    del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, text: str, seconds: float, embedding=None):
+        if not self.enabled or not text:
+            return
+        entry = _Entry(text, seconds, self._vector(embedding), time.monotonic() + self.ttl)
+        with self._lock:
+            bucket = self._data.setdefault(key, [])
+            bucket.insert(0, entry)
+            del bucket[max(1, self.variants if entry.embedding is not None else 1):]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "semantic": self.semantic,
+                "keys": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "llm_seconds_saved": round(self.seconds_saved, 3),
+            }
@@ -1,35 +1,416 @@
 # chatbot/llm_client.py
+"""
+Async, bounded LLM client shared by MedAgent.
+
+Every call goes through one LLMClient:
+
+    deadline     LLM_TIMEOUT seconds per completion (LLM_STREAM_TIMEOUT for
+                 a whole stream), covering the wait for a slot, every
+                 attempt and the backoff between them
+    concurrency  at most LLM_MAX_CONCURRENCY calls in flight per process;
+                 the rest queue against their own deadline
+    retries      up to LLM_RETRIES more attempts on transient errors
+                 (timeouts, connection errors, 408/429/5xx) with full-jitter
+                 exponential backoff from LLM_RETRY_BASE seconds; a stream
+                 is only retried before its first chunk
+    breaker      LLM_BREAKER_FAILURES failed calls in a row open the
+                 circuit for LLM_BREAKER_RESET seconds. Calls then fail at
+                 once with LLMUnavailable, until a single trial call is
+                 let through and closes it again
+
+Failures raise LLMError instead of coming back as reply text, so the
+agent can answer with the retrieved text instead.
+
+LLM_PROVIDER picks the backend: gemini (default), groq, or fake, a local
+stub that sleeps FAKE_LLM_LATENCY seconds (and fails FAKE_LLM_FAILURE_RATE
+of calls) for load tests. python -m bench.llm_client drives it.
+
+The provider runs on the client's own event-loop thread, so SDK sessions
+stay on one loop. Sync callers use complete()/stream()/submit() and wait
+at most the deadline; async callers await acomplete() or iterate
+astream() and hold no worker thread meanwhile.
+"""
 import os
-import google.generativeai as genai
+import time
+import random
+import asyncio
+import logging
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 DISCLAIMER = "\n\nThis is not a substitute for professional medical advice."
 
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY must be set in .env")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_STREAM_TIMEOUT = float(os.getenv("LLM_STREAM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
 
-def ask_gemini(prompt: str, history: list = None) -> str:
-    try:
-        if history:
-            response = model.generate_content([*history, {"role": "user", "parts": [prompt]}])
-        else:
-            response = model.generate_content(prompt)
+class LLMError(Exception):
+    """The LLM call failed (after any retries) or missed its deadline."""
+
+
+class LLMUnavailable(LLMError):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+class TransientLLMError(Exception):
+    """A provider error worth retrying."""
+
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+_TRANSIENT_NAMES = {
+    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "InternalServerError", "TooManyRequests",
+    "APIConnectionError", "APITimeoutError", "RateLimitError",
+}
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, TransientLLMError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in _TRANSIENT_STATUS:
+        return True
+    return type(error).__name__ in _TRANSIENT_NAMES
+
+
+# ---------------- Providers ----------------
+# complete(prompt) -> str and stream(prompt) -> async iterator of str;
+# SDK imports stay inside the provider so only the chosen one is needed.
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, model: str = GEMINI_MODEL):
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY must be set in .env (or choose another LLM_PROVIDER)")
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+
+    async def complete(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
         return response.text.strip()
-    except Exception as e:
-        return f"[Gemini error: {e}]"
 
-def stream_gemini(prompt: str):
-    try:
-        for chunk in model.generate_content(prompt, stream=True):
+    async def stream(self, prompt: str):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
             if chunk.text:
                 yield chunk.text
-    except Exception as e:
-        yield f"[Gemini stream error: {e}]"
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, api_key: str = GROQ_API_KEY, model: str = GROQ_MODEL):
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY must be set in .env (or choose another LLM_PROVIDER)")
+        from groq import AsyncGroq
+        # Retries are LLMClient's, so they share its deadline and jitter
+        self.client = AsyncGroq(api_key=api_key, max_retries=0)
+        self.model = model
+
+    async def complete(self, prompt: str) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=[{"role": "user", "content": prompt}])
+        return (response.choices[0].message.content or "").strip()
+
+    async def stream(self, prompt: str):
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=[{"role": "user", "content": prompt}], stream=True)
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+class FakeProvider:
+    """Local stand-in with configurable latency and failure rate, for load tests."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = FAKE_LLM_LATENCY, failure_rate: float = FAKE_LLM_FAILURE_RATE):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def complete(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            raise TransientLLMError("fake provider failure")
+        return "[fake reply] " + " ".join(prompt.split())[:120]
+
+    async def stream(self, prompt: str):
+        text = await self.complete(prompt)
+        for word in text.split(" "):
+            yield word + " "
+
+
+PROVIDERS = {"gemini": GeminiProvider, "groq": GroqProvider, "fake": FakeProvider}
+
+
+# ---------------- Circuit breaker ----------------
+class CircuitBreaker:
+    """closed -> open after `failures` failed calls in a row -> half-open after `reset` s."""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset: float = LLM_BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial:
+            self.trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self):
+        self.consecutive += 1
+        if self.trial or (self.opened_at is None and self.consecutive >= self.failures):
+            self.opened_at = time.monotonic()
+            self.opens += 1
+        self.trial = False
+
+    def release_trial(self):
+        """A trial call was cancelled before it could succeed or fail."""
+        self.trial = False
+
+
+_DONE = object()
+
+
+async def _next_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return _DONE
+
+
+# ---------------- Client ----------------
+class LLMClient:
+    def __init__(self, provider=LLM_PROVIDER, timeout: float = LLM_TIMEOUT,
+                 stream_timeout: float = LLM_STREAM_TIMEOUT, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 retries: int = LLM_RETRIES, retry_base: float = LLM_RETRY_BASE, breaker: CircuitBreaker = None):
+        if isinstance(provider, str):
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unsupported LLM_PROVIDER: {provider} (expected one of {sorted(PROVIDERS)})")
+            self.provider_name, self._provider = provider, None
+        else:
+            self.provider_name, self._provider = provider.name, provider
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.retry_base = retry_base
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._slots = None
+        self.in_flight = 0
+        self.calls = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.rejected = 0
+
+    # --- event loop thread ---
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    # --- on the client loop ---
+    def _get_provider(self):
+        # Built on first use, so a missing API key fails calls (and trips
+        # the breaker) instead of failing at import
+        if self._provider is None:
+            self._provider = PROVIDERS[self.provider_name]()
+        return self._provider
+
+    def _admit(self):
+        self.calls += 1
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailable(f"{self.provider_name} circuit open")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def _backoff(self, error: Exception, attempt: int, deadline: float) -> bool:
+        """Sleep before another attempt; False when `error` is final."""
+        loop = asyncio.get_running_loop()
+        delay = random.uniform(0, self.retry_base * 2 ** attempt)
+        if attempt >= self.retries or not is_transient(error) or loop.time() + delay >= deadline:
+            return False
+        self.retried += 1
+        logger.warning(f"[llm] {type(error).__name__} from {self.provider_name}, "
+                       f"retry {attempt + 1}/{self.retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return True
+
+    def _failure(self, error: Exception) -> LLMError:
+        self.failed += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        self.breaker.record_failure()
+        detail = "deadline exceeded" if isinstance(error, asyncio.TimeoutError) else f"{type(error).__name__}: {error}"
+        return LLMError(f"{self.provider_name} call failed: {detail}")
+
+    async def _attempt(self, prompt: str) -> str:
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await self._get_provider().complete(prompt)
+            finally:
+                self.in_flight -= 1
+
+    async def _complete(self, prompt: str, timeout: float) -> str:
+        self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(self._attempt(prompt), deadline - loop.time())
+                except Exception as e:
+                    if await self._backoff(e, attempt, deadline):
+                        attempt += 1
+                        continue
+                    raise self._failure(e) from e
+                self.breaker.record_success()
+                return text
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+
+    async def _stream(self, prompt: str, timeout: float):
+        self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        sent = False
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), deadline - loop.time())
+                    self.in_flight += 1
+                    try:
+                        chunks = self._get_provider().stream(prompt).__aiter__()
+                        while True:
+                            chunk = await asyncio.wait_for(_next_chunk(chunks), deadline - loop.time())
+                            if chunk is _DONE:
+                                break
+                            sent = True
+                            yield chunk
+                    finally:
+                        self.in_flight -= 1
+                        self._slots.release()
+                except Exception as e:
+                    if not sent and await self._backoff(e, attempt, deadline):
+                        attempt += 1
+                        continue
+                    raise self._failure(e) from e
+                self.breaker.record_success()
+                return
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release_trial()
+            raise
+
+    # --- public API, callable from any thread ---
+    def submit(self, prompt: str, timeout: float = None):
+        """Start a completion; returns a concurrent Future (result() raises LLMError, cancel() stops it)."""
+        return self._run(self._complete(prompt, timeout or self.timeout))
+
+    def complete(self, prompt: str, timeout: float = None) -> str:
+        return self.submit(prompt, timeout).result()
+
+    async def acomplete(self, prompt: str, timeout: float = None) -> str:
+        return await asyncio.wrap_future(self.submit(prompt, timeout))
+
+    def stream(self, prompt: str, timeout: float = None):
+        """Reply chunks; raises LLMError (possibly after some chunks) on failure."""
+        chunks = self._stream(prompt, timeout or self.stream_timeout)
+        try:
+            while True:
+                chunk = self._run(_next_chunk(chunks)).result()
+                if chunk is _DONE:
+                    return
+                yield chunk
+        finally:
+            self._run(chunks.aclose()).result()
+
+    async def astream(self, prompt: str, timeout: float = None):
+        chunks = self._stream(prompt, timeout or self.stream_timeout)
+        try:
+            while True:
+                chunk = await asyncio.wrap_future(self._run(_next_chunk(chunks)))
+                if chunk is _DONE:
+                    return
+                yield chunk
+        finally:
+            await asyncio.wrap_future(self._run(chunks.aclose()))
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider_name,
+            "circuit": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "calls": self.calls,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "retries": self.retried,
+            "rejected": self.rejected,
+        }
+
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_llm() -> LLMClient:
+    """Shared client for LLM_PROVIDER."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
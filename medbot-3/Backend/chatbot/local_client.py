@@ -0,0 +1,51 @@
+# chatbot/local_client.py
+# Same interface as api_client, but calls the retrieval service in-process
+# instead of making an HTTP request back into our own FastAPI server.
+from chatbot import retrieval
+from chatbot.thresholds import is_hit
+
+def _hits(table: str, data: dict, field: str):
+    # Hit/miss is decided here from the scores, against the agent's thresholds;
+    # results come in fused (RRF) order, callers want the most similar first
+    hits = [(x[field], x["similarity"]) for x in data.get("results", [])
+            if x.get(field) and is_hit(table, x["similarity"])]
+    return sorted(hits, key=lambda h: h[1], reverse=True)
+
+# `lang` (en/hi/hinglish) searches that language first; None searches all of them
+def search_faq(query: str, lang: str = None):
+    try:
+        return [(query, ans, sim) for ans, sim in _hits("faqs", retrieval.faq_search(query, lang=lang), "answer")]
+    except Exception as e:
+        print("FAQ lookup error:", e)
+    return []
+
+def search_scheme(query: str, lang: str = None):
+    try:
+        return [(query, purpose, sim) for purpose, sim in _hits("schemes", retrieval.schemes_search(query, lang=lang), "purpose")]
+    except Exception as e:
+        print("Scheme lookup error:", e)
+    return []
+
+def search_symptom(query: str, lang: str = None):
+    try:
+        return [(query, ans, sim) for ans, sim in _hits("symptoms", retrieval.symptoms_search(query, lang=lang), "answer")]
+    except Exception as e:
+        print("Symptom lookup error:", e)
+    return []
+
+def search_risk(query: str, lang: str = None):
+    try:
+        return [(query, ans, sim) for ans, sim in _hits("risks", retrieval.risks_search(query, lang=lang), "answer")]
+    except Exception as e:
+        print("Risk lookup error:", e)
+    return []
+
+def embed_query(query: str):
+    return retrieval.embed_query(query)
+
+def search_scored(table: str, query: str, embedding=None, lang: str = None):
+    try:
+        return retrieval.scored_search(table, query, embedding, lang=lang)
+    except Exception as e:
+        print(f"{table} lookup error:", e)
+    return []
@@ -0,0 +1,351 @@
+# chatbot/retrieval.py
+"""
+In-process retrieval service.
+
+Both the FastAPI endpoints in main.py and MedAgent call these functions
+directly, so a chat turn never loops back over HTTP into its own server.
+Each search returns the same payload the matching endpoint serves.
+
+The SQL and payload shaping live here once; chatbot/retrieval_async.py
+reuses them on top of the asyncio pool.
+
+Searches are hybrid by default (HYBRID_SEARCH=1): the vector top
+candidates and the lexical top candidates (full-text over the stored
+search_tsv column, minus each table's high-frequency words, plus trigram
+over search_text; see db/schema.py) are fused with reciprocal-rank
+fusion in one SQL statement. Exact keywords like "pmjay" are found
+through the GIN indexes even when the embedding is unsure. Every row still
+reports its vector similarity, so the per-table thresholds apply unchanged.
+
+Searches take the user's language (en/hi/hinglish). Tables whose rows
+carry a `language` are filtered to it, which lets Postgres use that
+language's partial ANN index (db/indexes.py). If that finds no hit, the
+search is repeated across all languages. Schemes return the name and
+purpose columns of the user's language (English when missing).
+"""
+import os
+from dotenv import load_dotenv
+from db.indexes import (LANGUAGES, LANGUAGE_TABLES, apply_search_params, index_config,
+                        language_predicate, order_sql)
+from db.pool import get_conn, release_conn
+from db.embeddings import encode_query
+from db.cache import cached_result
+from chatbot.thresholds import SIM_THRESHOLDS, is_hit
+from chatbot.utils import detect_language_tight
+
+load_dotenv()
+
+# table -> (payload columns, result field names); the similarity is appended
+SEARCHES = {
+    "faqs": ("answer", ("answer",)),
+    "schemes": ("scheme_name_en, purpose_en", ("scheme_name", "purpose")),
+    "symptoms": ("symptom, answer", ("symptom", "answer")),
+    "risks": ("risk, answer", ("risk", "answer")),
+}
+
+# Rows returned per search unless the caller asks for a different k
+DEFAULT_TOP_K = int(os.getenv("RESULT_TOP_K", "3"))
+MAX_TOP_K = 20
+
+# Hybrid search: candidates taken from each ranking, and the RRF constant
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "40"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# table -> column returned as the "answer" text by scored_search()
+ANSWER_COLUMNS = {
+    "faqs": "answer",
+    "schemes": "purpose_en",
+    "symptoms": "answer",
+    "risks": "answer",
+}
+
+def resolve_language(query: str, lang: str = None):
+    """`lang` when given ("all" disables the filter), else the language detected from `query`."""
+    if lang == "all":
+        return None
+    if lang:
+        return lang if lang in LANGUAGES else None
+    return detect_language_tight(query)
+
+def search_language(table: str, lang: str = None):
+    """Language to filter `table` by, or None (no language given, or no language column)."""
+    return lang if lang in LANGUAGES and table in LANGUAGE_TABLES else None
+
+def _localized(column: str, lang: str = None) -> str:
+    # schemes keep one row per scheme with _en/_hi/_hinglish columns
+    if lang in LANGUAGES and lang != "en":
+        return f"COALESCE({column}_{lang}, {column}_en)"
+    return f"{column}_en"
+
+def search_columns(table: str, lang: str = None) -> str:
+    if table == "schemes":
+        return f"{_localized('scheme_name', lang)}, {_localized('purpose', lang)}"
+    return SEARCHES[table][0]
+
+def answer_column(table: str, lang: str = None) -> str:
+    if table == "schemes":
+        return _localized("purpose", lang)
+    return ANSWER_COLUMNS[table]
+
+def with_language_fallback(table: str, lang: str, run):
+    """run(lang) first; when none of its rows is a hit, run(None) across all languages."""
+    rows = run(lang)
+    if lang and not any(is_hit(table, r[-1]) for r in rows):
+        rows = run(None)
+    return rows
+
+def _embed(query: str):
+    return encode_query(query).tolist()
+
+def embed_query(query: str):
+    """Query embedding, so callers fanning out over several tables encode once."""
+    return _embed(query)
+
+def sql_params(embedding, query: str, limit: int) -> dict:
+    """Named parameters shared by every statement below."""
+    return {"embedding": embedding, "query": query, "limit": limit}
+
+def _where(lang: str = None, keyword: str = "WHERE") -> str:
+    return f"{keyword} {language_predicate(lang)}" if lang else ""
+
+def nearest_sql(table: str, columns: str, lang: str = None) -> str:
+    """
+    Stored and query vectors are unit length, so the inner product is the
+    cosine similarity; `<#>` returns its negation, hence the minus sign.
+    Ordering by the raw operator expression (not the derived similarity)
+    is what lets Postgres serve the query from the table's ANN index.
+
+    The similarity is always computed on the full-precision column. With
+    binary index storage the Hamming candidates are re-ranked by it.
+    """
+    cfg = index_config(table)
+    if cfg["storage"] == "binary":
+        return f"""
+            SELECT {columns}, similarity FROM (
+                SELECT {columns}, -(embedding <#> %(embedding)s::vector) AS similarity
+                FROM {table}
+                {_where(lang)}
+                ORDER BY {order_sql(table)}
+                LIMIT {max(cfg["rerank"], MAX_TOP_K)}
+            ) candidates
+            ORDER BY similarity DESC
+            LIMIT %(limit)s;
+        """
+    return f"""
+        SELECT {columns}, -(embedding <#> %(embedding)s::vector) AS similarity
+        FROM {table}
+        {_where(lang)}
+        ORDER BY {order_sql(table)}
+        LIMIT %(limit)s;
+    """
+
+# Query lexemes minus the table's high-frequency ones (lexical_stopwords,
+# db/schema.py), ORed: every remaining term is rare, so the GIN index on the
+# stored search_tsv narrows the match. Trigram word similarity catches
+# misspellings and split words ("pm jay"). Each arm keeps its own top
+# HYBRID_CANDIDATES (full-text hits by the stored-column rank, trigram hits
+# by word similarity), so trigram-only rows are never cut as rank-0 ties.
+_LEXICAL_MATCH = """
+    WITH tsq AS (
+        SELECT to_tsquery('simple', string_agg(quote_literal(w), ' | ')) AS q
+        FROM unnest(tsvector_to_array(to_tsvector('simple', %(query)s))) AS w
+        WHERE w NOT IN (SELECT word FROM lexical_stopwords WHERE tbl = '{table}')
+    )
+    SELECT match_id, match_text, max(ts_rank) AS ts_rank FROM (
+        (SELECT id AS match_id, search_text AS match_text, ts_rank_cd(search_tsv, tsq.q) AS ts_rank
+         FROM {table}, tsq
+         WHERE search_tsv @@ tsq.q {language}
+         ORDER BY ts_rank DESC
+         LIMIT {limit})
+        UNION ALL
+        (SELECT id, search_text, coalesce(ts_rank_cd(search_tsv, tsq.q), 0)
+         FROM {table}, tsq
+         WHERE %(query)s <%% search_text {language}
+         ORDER BY word_similarity(%(query)s, search_text) DESC
+         LIMIT {limit})
+    ) hits
+    GROUP BY match_id, match_text
+"""
+_LEXICAL_ORDER = "ts_rank DESC, word_similarity(%(query)s, match_text) DESC"
+
+def _lexical_match(table: str, lang: str = None) -> str:
+    return _LEXICAL_MATCH.format(table=table, language=_where(lang, "AND"), limit=HYBRID_CANDIDATES)
+
+def lexical_sql(table: str, columns: str, lang: str = None) -> str:
+    """Lexical-only top rows (no embedding needed); similarity is reported as 0."""
+    return f"""
+        SELECT {columns}, 0.0::float8 AS similarity
+        FROM ({_lexical_match(table, lang)}) lexical JOIN {table} t ON t.id = lexical.match_id
+        ORDER BY {_LEXICAL_ORDER}
+        LIMIT %(limit)s;
+    """
+
+def semantic_candidates_sql(table: str, lang: str = None) -> str:
+    """
+    (id, rank) of the vector candidates for hybrid_sql, ranked like
+    nearest_sql: with binary index storage the Hamming candidates are
+    re-ranked by the full-precision similarity before they get a rank.
+    """
+    cfg = index_config(table)
+    if cfg["storage"] == "binary":
+        return f"""
+            SELECT id, row_number() OVER (ORDER BY similarity DESC) AS rank FROM (
+                SELECT id, -(embedding <#> %(embedding)s::vector) AS similarity
+                FROM {table}
+                {_where(lang)}
+                ORDER BY {order_sql(table)}
+                LIMIT {max(cfg["rerank"], HYBRID_CANDIDATES)}
+            ) candidates
+            ORDER BY rank
+            LIMIT {HYBRID_CANDIDATES}
+        """
+    return f"""
+            SELECT id, row_number() OVER (ORDER BY {order_sql(table)}) AS rank
+            FROM {table}
+            {_where(lang)}
+            ORDER BY {order_sql(table)}
+            LIMIT {HYBRID_CANDIDATES}
+        """
+
+def hybrid_sql(table: str, columns: str, lang: str = None) -> str:
+    """
+    Reciprocal-rank fusion of the vector and lexical candidate lists,
+    1 / (RRF_K + rank) summed over the lists a row appears in.
+    """
+    return f"""
+        WITH semantic AS ({semantic_candidates_sql(table, lang)}),
+        lexical AS (
+            SELECT match_id AS id, row_number() OVER (ORDER BY {_LEXICAL_ORDER}) AS rank
+            FROM ({_lexical_match(table, lang)}) matches
+        ),
+        fused AS (
+            SELECT COALESCE(s.id, l.id) AS match_id,
+                   COALESCE(1.0 / ({RRF_K} + s.rank), 0) + COALESCE(1.0 / ({RRF_K} + l.rank), 0) AS score
+            FROM semantic s FULL OUTER JOIN lexical l ON s.id = l.id
+        )
+        SELECT {columns}, -(t.embedding <#> %(embedding)s::vector) AS similarity
+        FROM fused JOIN {table} t ON t.id = fused.match_id
+        ORDER BY fused.score DESC
+        LIMIT %(limit)s;
+    """
+
+def search_sql(table: str, columns: str, lang: str = None) -> str:
+    return hybrid_sql(table, columns, lang) if HYBRID_SEARCH else nearest_sql(table, columns, lang)
+
+def clamp_k(k) -> int:
+    return max(1, min(int(k or DEFAULT_TOP_K), MAX_TOP_K))
+
+def _nearest(table: str, query: str, k: int, lang: str = None):
+    """
+    Top-k rows of `table` for `query` (hybrid or vector-only), in `lang`
+    first, cached on the normalized query text (db.cache).
+    """
+    columns = search_columns(table, lang)
+    def run(filter_lang):
+        return cached_result(table, f"{columns}|{filter_lang or '*'}", query, k,
+                             lambda: _nearest_uncached(table, columns, query, _embed(query), k, filter_lang))
+    return with_language_fallback(table, search_language(table, lang), run)
+
+def _nearest_uncached(table: str, columns: str, query: str, embedding, limit: int, lang: str = None):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            apply_search_params(cur, table)
+            cur.execute(search_sql(table, columns, lang), sql_params(embedding, query, limit))
+            return cur.fetchall()
+    finally:
+        release_conn(conn)
+
+def scored_search(table: str, query: str, embedding=None, k: int = 3, lang: str = None):
+    """
+    [(answer_text, similarity)] for the top-k rows of `table`, best first.
+    Pass `embedding` (from embed_query) to reuse one encode across tables.
+    """
+    column = answer_column(table, lang)
+    def run(filter_lang):
+        def compute():
+            emb = embedding if embedding is not None else _embed(query)
+            rows = _nearest_uncached(table, column, query, emb, k, filter_lang)
+            return [(text, float(sim)) for text, sim in rows]
+        return cached_result(table, f"scored:{column}|{filter_lang or '*'}", query, k, compute)
+    return with_language_fallback(table, search_language(table, lang), run)
+
+# ---------------- Payloads ----------------
+# Every payload carries the scored top-k "results" (each flagged "hit" against
+# the table's threshold) plus a top-level "hit". Single-answer tables keep the
+# old top-level fields, filled from the most similar hit. Results stay in
+# search (RRF) order, so the first row is not necessarily the most similar.
+def _results(table: str, rows):
+    fields = SEARCHES[table][1]
+    results = []
+    for r in rows:
+        similarity = float(r[-1])
+        item = dict(zip(fields, r[:-1]))
+        item["similarity"] = similarity
+        item["hit"] = is_hit(table, similarity)
+        results.append(item)
+    return results
+
+def _single_payload(table: str, rows, key: str, miss_answer: str) -> dict:
+    results = _results(table, rows)
+    hits = [r for r in results if r["hit"]]
+    best = max(hits or results, key=lambda r: r["similarity"]) if results else None
+    payload = {
+        "hit": bool(best and best["hit"]),
+        "threshold": SIM_THRESHOLDS[table],
+        "similarity": best["similarity"] if best else 0.0,
+        "results": results,
+    }
+    if payload["hit"]:
+        if key:
+            payload[key] = best[key]
+        payload["answer"] = best["answer"]
+    else:
+        if key:
+            payload[key] = None
+        payload["answer"] = miss_answer
+    return payload
+
+def faq_payload(rows) -> dict:
+    return _single_payload("faqs", rows, None, "No FAQ found. Please consult a doctor.")
+
+def schemes_payload(rows) -> dict:
+    results = _results("schemes", rows)
+    payload = {
+        "hit": any(r["hit"] for r in results),
+        "threshold": SIM_THRESHOLDS["schemes"],
+        "results": results,
+    }
+    if not payload["hit"]:
+        payload["message"] = "No schemes found. Please check government portals."
+    return payload
+
+def symptoms_payload(rows) -> dict:
+    return _single_payload("symptoms", rows, "symptom", "No symptom info found. Please consult a doctor.")
+
+def risks_payload(rows) -> dict:
+    return _single_payload("risks", rows, "risk", "No risk info found. Please consult a doctor.")
+
+PAYLOADS = {
+    "faqs": faq_payload,
+    "schemes": schemes_payload,
+    "symptoms": symptoms_payload,
+    "risks": risks_payload,
+}
+
+# ---------------- FAQ ----------------
+def faq_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return faq_payload(_nearest("faqs", query, clamp_k(k), lang))
+
+# ---------------- Schemes ----------------
+def schemes_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return schemes_payload(_nearest("schemes", query, clamp_k(k), lang))
+
+# ---------------- Symptoms ----------------
+def symptoms_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return symptoms_payload(_nearest("symptoms", query, clamp_k(k), lang))
+
+# ---------------- Risks ----------------
+def risks_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return risks_payload(_nearest("risks", query, clamp_k(k), lang))
@@ -0,0 +1,58 @@
+# chatbot/retrieval_async.py
+"""
+Async counterpart of chatbot/retrieval.py for the async API handlers.
+
+Same SQL, payloads and result cache as the sync service. Queries run on
+the psycopg 3 asyncio pool (db/async_pool.py), embeddings are awaited on
+the shared micro-batcher, and result-cache calls that reach Redis
+(CACHE_REDIS_URL) run on a thread, so the event loop never blocks.
+"""
+import numpy as np
+from db.indexes import search_params_sql
+from db.async_pool import get_async_pool
+from db.embeddings import encode_query_async
+from db.cache import get_result, put_result, run_cache_io
+from chatbot.retrieval import (PAYLOADS, DEFAULT_TOP_K, search_sql, sql_params, clamp_k, is_hit,
+                               search_columns, search_language)
+
+async def _run(table: str, columns: str, query: str, limit: int, lang: str = None):
+    kind = f"{columns}|{lang or '*'}"
+    rows = await run_cache_io(get_result, table, kind, query, limit)
+    if rows is not None:
+        return rows
+
+    embedding = np.asarray(await encode_query_async(query), dtype=np.float32)
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(search_params_sql(table))
+            await cur.execute(search_sql(table, columns, lang), sql_params(embedding, query, limit))
+            rows = await cur.fetchall()
+
+    rows = [tuple(r) for r in rows]
+    await run_cache_io(put_result, table, kind, query, limit, rows)
+    return rows
+
+async def _nearest(table: str, query: str, limit: int, lang: str = None):
+    # same language-first, all-languages-on-miss order as retrieval.with_language_fallback
+    columns = search_columns(table, lang)
+    part = search_language(table, lang)
+    rows = await _run(table, columns, query, limit, part)
+    if part and not any(is_hit(table, r[-1]) for r in rows):
+        rows = await _run(table, columns, query, limit)
+    return rows
+
+async def search(table: str, query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return PAYLOADS[table](await _nearest(table, query, clamp_k(k), lang))
+
+async def faq_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return await search("faqs", query, k, lang)
+
+async def schemes_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return await search("schemes", query, k, lang)
+
+async def symptoms_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return await search("symptoms", query, k, lang)
+
+async def risks_search(query: str, k: int = DEFAULT_TOP_K, lang: str = None) -> dict:
+    return await search("risks", query, k, lang)
@@ -0,0 +1,180 @@
+# chatbot/sessions.py
+"""
+Conversation-state store for MedAgent's multi-turn symptom flow.
+
+SESSION_STORE picks the backend:
+
+    memory   (default) per-process dict with a TTL and an LRU size cap;
+             nothing outlives the process and workers don't share it
+    sqlite   one SQLite file in WAL mode shared by every worker process
+             on the host, so a follow-up message may land on any
+             uvicorn worker (SESSION_DB_PATH)
+
+Both backends drop sessions idle for SESSION_TTL_SECONDS and keep at most
+SESSION_MAX_ENTRIES, so abandoned flows can no longer grow without bound.
+Sessions are read with get(), mutated, and written back with put().
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(BACKEND_DIR, "chatbot", ".sessions.sqlite3"))
+
+
+class Session:
+    """One user's in-progress symptom flow."""
+
+    __slots__ = ("awaiting", "last_fact", "duration", "severity", "extra_symptoms", "lang", "updated_at")
+
+    def __init__(self, awaiting=None, last_fact=None, duration=None, severity=None,
+                 extra_symptoms=None, lang=None, updated_at=0.0):
+        self.awaiting = awaiting
+        self.last_fact = last_fact
+        self.duration = duration
+        self.severity = severity
+        self.extra_symptoms = extra_symptoms
+        self.lang = lang
+        self.updated_at = updated_at
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+
+class MemorySessionStore:
+    """TTL + LRU-capped sessions in this process."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_entries: int = SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def get(self, user_id: str):
+        with self._lock:
+            session = self._data.get(user_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl:
+                del self._data[user_id]
+                self.expired += 1
+                return None
+            self._data.move_to_end(user_id)
+            return session
+
+    def put(self, user_id: str, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._data[user_id] = session
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self), "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl, "evicted": self.evicted, "expired": self.expired}
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a WAL-mode SQLite file shared by the worker processes on one
+    host. Each thread keeps its own connection. Expired rows and rows over
+    the size cap are purged every PURGE_EVERY writes.
+    """
+
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL_SECONDS,
+                 max_entries: int = SESSION_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    user_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id: str):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE user_id = ? AND updated_at >= ?",
+            (user_id, time.time() - self.ttl),
+        ).fetchone()
+        return Session.from_dict(json.loads(row[0])) if row else None
+
+    def put(self, user_id: str, session: Session):
+        session.updated_at = time.time()
+        self._conn().execute(
+            "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(session.to_dict(), ensure_ascii=False), session.updated_at),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge()
+
+    def delete(self, user_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def purge(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+        conn.execute("""
+            DELETE FROM sessions WHERE user_id IN (
+                SELECT user_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT count(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "sessions": len(self),
+                "max_entries": self.max_entries, "ttl_seconds": self.ttl}
+
+
+def get_session_store():
+    """Store selected by SESSION_STORE."""
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore()
+    if SESSION_STORE != "memory":
+        raise ValueError(f"Unsupported SESSION_STORE: {SESSION_STORE}")
+    return MemorySessionStore()
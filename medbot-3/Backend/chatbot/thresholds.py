@@ -0,0 +1,22 @@
+# chatbot/thresholds.py
+# Per-table similarity cutoffs: a retrieved row only counts as a hit when its
+# cosine similarity reaches the table's threshold. E5 similarities sit in a
+# narrow band (unrelated text still scores ~0.7), so tune these per corpus,
+# e.g. SIM_THRESHOLD_FAQS=0.86.
+import os
+
+_DEFAULTS = {
+    "faqs": 0.83,
+    "schemes": 0.80,
+    "symptoms": 0.82,
+    "risks": 0.83,
+}
+
+SIM_THRESHOLDS = {
+    table: float(os.getenv(f"SIM_THRESHOLD_{table.upper()}", default))
+    for table, default in _DEFAULTS.items()
+}
+
+
+def is_hit(table: str, similarity: float) -> bool:
+    return similarity is not None and similarity >= SIM_THRESHOLDS.get(table, 1.0)
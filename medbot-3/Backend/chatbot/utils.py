@@ -1,5 +1,5 @@
 import re
-from langdetect import detect
+from chatbot.language import detect_language
 
 # Standard disclaimer
 DISCLAIMER = "\n\nThis is not a substitute for professional medical advice."
@@ -14,35 +14,16 @@ def detect_language_tight(text: str) -> str:
     """
     Detect user language in a strict way:
     - 'hi' → Hindi only (Devanagari script)
-    - 'hinglish' → Romanized Hindi/mixture
+    - 'hinglish' → Romanized Hindi/mixture (token lexicon, see chatbot/language.py)
     - 'en' → English
     """
-    text_strip = text.strip()
-
-    # Hindi script (Devanagari)
-    if re.search(r"[\u0900-\u097F]", text_strip):
-        return "hi"
-
-    # Hinglish (Roman script but Hindi words)
-    hinglish_words = [
-        "hai", "nahi", "acha", "kya", "kaise", "thoda", "bimari", "bukhar", "dard"
-    ]
-    if any(w in text_strip.lower() for w in hinglish_words):
-        return "hinglish"
-
-    # Fallback to langdetect
-    try:
-        lang = detect(text_strip)
-        if lang == "hi":
-            return "hi"
-        return "en"
-    except Exception:
-        return "en"
+    return detect_language(text.strip())
 
 
 def detect_language_simple(text: str) -> str:
     """Old fallback detector (kept for compatibility with older code)."""
     try:
+        from langdetect import detect
         lang = detect(text)
         if lang == "hi":
             return "hi"
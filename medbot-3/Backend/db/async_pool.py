@@ -0,0 +1,77 @@
+# db/async_pool.py
+"""
+asyncio-native Postgres pool (psycopg 3) for the async API handlers.
+
+Every new connection gets the pgvector types registered, so numpy arrays
+bind directly as `vector`. Settings:
+
+    ASYNC_DB_POOL_MIN      connections kept open        (default 2)
+    ASYNC_DB_POOL_MAX      hard cap                      (default 20)
+    DB_POOL_TIMEOUT        seconds to wait for a conn   (default 30)
+    DB_STATEMENT_TIMEOUT   per-statement limit in ms    (default 0 = off)
+    DB_PREPARE_THRESHOLD   executions before a statement is prepared
+                           server-side (default 5; "off" disables, e.g.
+                           behind pgbouncer in transaction mode)
+"""
+import os
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "2"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+_prepare = os.getenv("DB_PREPARE_THRESHOLD", "5").lower()
+DB_PREPARE_THRESHOLD = None if _prepare in ("off", "none", "") else int(_prepare)
+
+async_pool = None
+_lock = asyncio.Lock()
+
+
+async def _configure(conn):
+    from pgvector.psycopg import register_vector_async
+    await register_vector_async(conn)
+    conn.prepare_threshold = DB_PREPARE_THRESHOLD
+    if DB_STATEMENT_TIMEOUT:
+        await conn.execute(f"SET statement_timeout = {DB_STATEMENT_TIMEOUT}")
+    # leave the connection idle (not in a transaction) when handing it to the pool
+    await conn.commit()
+
+
+async def get_async_pool():
+    """Open the pool on first use (normally at API startup)."""
+    global async_pool
+    if async_pool is None:
+        async with _lock:
+            if async_pool is None:
+                from psycopg_pool import AsyncConnectionPool
+                pool = AsyncConnectionPool(
+                    DATABASE_URL,
+                    min_size=ASYNC_DB_POOL_MIN,
+                    max_size=ASYNC_DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    configure=_configure,
+                    open=False,
+                )
+                await pool.open()
+                async_pool = pool
+                logger.info(f"[async_pool] Opened pool ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} conns)")
+    return async_pool
+
+
+async def close_async_pool():
+    global async_pool
+    if async_pool is not None:
+        await async_pool.close()
+        async_pool = None
+
+
+def async_pool_stats() -> dict:
+    if async_pool is None:
+        return {"open": False}
+    return {"open": True, **async_pool.get_stats()}
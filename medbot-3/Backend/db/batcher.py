@@ -0,0 +1,121 @@
+# db/batcher.py
+"""
+Micro-batching for query embeddings.
+
+Concurrent requests each need one short query encoded. Encoding them one
+at a time means many batch-of-1 forward passes competing for the same
+torch threads. EmbeddingBatcher queues incoming texts, waits up to
+`max_wait_ms` (or until `max_batch` texts are queued), encodes the batch
+in one call, and hands each caller its own row.
+"""
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode_fn, max_batch: int = 16, max_wait_ms: float = 3.0):
+        """`encode_fn(list_of_texts)` must return one embedding per text, in order."""
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+        self._batch_sizes = {}
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+        self._encode_total = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def encode(self, text: str, timeout: float = None):
+        """Blocking: returns the embedding for `text` once its batch is encoded."""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # Nothing raised here may end the thread: every later encode() would hang
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception as e:
+                logger.exception(f"[batcher] unexpected error, continuing: {e}")
+
+    def _run_batch(self, batch):
+        # Drop futures whose caller already gave up (e.g. a cancelled asyncio
+        # task via wrap_future); setting a result on them raises InvalidStateError
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for text, _, _ in batch]
+        started = time.perf_counter()
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            logger.error(f"[batcher] encode failed for batch of {len(batch)}: {e}")
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+            return
+        finished = time.perf_counter()
+        for (_, fut, _), vec in zip(batch, vectors):
+            fut.set_result(vec)
+        self._record(batch, started, finished)
+
+    def _record(self, batch, started, finished):
+        delays = [started - queued_at for _, _, queued_at in batch]
+        size = len(batch)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._queue_delay_total += sum(delays)
+            self._queue_delay_max = max(self._queue_delay_max, max(delays))
+            self._encode_total += finished - started
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches, items = self._batches, self._items
+            return {
+                "batches": batches,
+                "items": items,
+                "avg_batch_size": items / batches if batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_delay_ms": 1000 * self._queue_delay_total / items if items else 0.0,
+                "max_queue_delay_ms": 1000 * self._queue_delay_max,
+                "avg_encode_ms": 1000 * self._encode_total / batches if batches else 0.0,
+                "pending": self._queue.qsize(),
+            }
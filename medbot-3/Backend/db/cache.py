@@ -0,0 +1,289 @@
+# db/cache.py
+"""
+Query caches keyed on normalized text (chatbot.utils.normalize_text).
+
+Two tiers:
+  * embedding cache - normalized query -> query embedding
+  * result cache    - (table, kind, normalized query, k) -> search payload
+
+Both are bounded LRU caches with a TTL, and both keep hit/miss counters.
+Result keys carry a per-table generation number. invalidate_table()
+bumps that number, so a loader that writes new rows makes every old
+result for that table unreachable.
+
+Set CACHE_REDIS_URL to also use a shared Redis tier. Then uvicorn
+workers share hits, and an invalidation from a loader process reaches
+every worker. Without Redis, another process's writes become visible
+after at most RESULT_CACHE_TTL seconds.
+
+    EMB_CACHE_SIZE / EMB_CACHE_TTL        (default 10000 / 86400 s)
+    RESULT_CACHE_SIZE / RESULT_CACHE_TTL  (default 5000 / 300 s)
+    CACHE_ENABLED=0                       disables both tiers
+"""
+import os
+import time
+import asyncio
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from chatbot.utils import normalize_text
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+EMB_CACHE_SIZE = int(os.getenv("EMB_CACHE_SIZE", "10000"))
+EMB_CACHE_TTL = float(os.getenv("EMB_CACHE_TTL", "86400"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "5000"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class RedisTier:
+    """Optional shared tier; values are pickled and expire via Redis TTLs."""
+
+    def __init__(self, url: str, prefix: str = "arogyam"):
+        import redis  # optional dependency, only needed with CACHE_REDIS_URL
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, name: str, key) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{name}:{digest}"
+
+    def get(self, name: str, key, default=_MISSING):
+        try:
+            raw = self.client.get(self._key(name, key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[cache] redis get failed: {e}")
+            return default
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, name: str, key, value, ttl: float):
+        try:
+            self.client.setex(self._key(name, key), max(1, int(ttl)), pickle.dumps(value))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[cache] redis set failed: {e}")
+
+    def generation(self, table: str) -> int:
+        try:
+            raw = self.client.get(f"{self.prefix}:gen:{table}")
+            return int(raw) if raw is not None else 0
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[cache] redis generation read failed: {e}")
+            return 0
+
+    def bump_generation(self, table: str):
+        try:
+            self.client.incr(f"{self.prefix}:gen:{table}")
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[cache] redis generation bump failed: {e}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+embedding_cache = TTLCache(EMB_CACHE_SIZE, EMB_CACHE_TTL)
+result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+_generations = {}
+_gen_lock = threading.Lock()
+_shared = None
+_shared_failed = False
+
+
+def _shared_tier():
+    global _shared, _shared_failed
+    if CACHE_REDIS_URL and _shared is None and not _shared_failed:
+        try:
+            _shared = RedisTier(CACHE_REDIS_URL)
+        except Exception as e:
+            _shared_failed = True
+            logger.warning(f"[cache] shared backend disabled: {e}")
+    return _shared
+
+
+def _generation(table: str):
+    shared = _shared_tier()
+    remote = shared.generation(table) if shared else 0
+    return (_generations.get(table, 0), remote)
+
+
+def cache_key(query: str) -> str:
+    return normalize_text(query or "")
+
+
+def get_embedding(query: str, default=None):
+    """Cached embedding for `query`, or `default`."""
+    if not CACHE_ENABLED:
+        return default
+    key = cache_key(query)
+    value = embedding_cache.get(key)
+    if value is not _MISSING:
+        return value
+    shared = _shared_tier()
+    if shared:
+        value = shared.get("emb", key)
+        if value is not _MISSING:
+            embedding_cache.set(key, value)
+            return value
+    return default
+
+
+def put_embedding(query: str, value):
+    if not CACHE_ENABLED:
+        return
+    key = cache_key(query)
+    embedding_cache.set(key, value)
+    shared = _shared_tier()
+    if shared:
+        shared.set("emb", key, value, EMB_CACHE_TTL)
+
+
+def cached_embedding(query: str, compute):
+    """Return the embedding for `query`, calling compute(normalized_query) on a miss."""
+    value = get_embedding(query, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = compute(cache_key(query))
+    put_embedding(query, value)
+    return value
+
+
+async def run_cache_io(fn, *args):
+    """
+    Call a cache function from async code. The in-process tier is served
+    inline; with a shared Redis tier the call does network I/O, so it runs
+    on a worker thread instead of blocking the event loop.
+    """
+    if CACHE_ENABLED and _shared_tier():
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def _result_key(table: str, kind: str, query: str, k: int):
+    return (table, kind, cache_key(query), k, _generation(table))
+
+
+def get_result(table: str, kind: str, query: str, k: int, default=None):
+    """Cached search payload for (table, kind, query, k), or `default`."""
+    if not CACHE_ENABLED:
+        return default
+    key = _result_key(table, kind, query, k)
+    value = result_cache.get(key)
+    if value is not _MISSING:
+        return value
+    shared = _shared_tier()
+    if shared:
+        value = shared.get("res", key)
+        if value is not _MISSING:
+            result_cache.set(key, value)
+            return value
+    return default
+
+
+def put_result(table: str, kind: str, query: str, k: int, value):
+    if not CACHE_ENABLED:
+        return
+    key = _result_key(table, kind, query, k)
+    result_cache.set(key, value)
+    shared = _shared_tier()
+    if shared:
+        shared.set("res", key, value, RESULT_CACHE_TTL)
+
+
+def cached_result(table: str, kind: str, query: str, k: int, compute):
+    """Return the cached search payload for (table, kind, query, k), or compute and store it."""
+    value = get_result(table, kind, query, k, _MISSING)
+    if value is not _MISSING:
+        return value
+    value = compute()
+    put_result(table, kind, query, k, value)
+    return value
+
+
+def invalidate_table(table: str):
+    """Drop cached results for `table`; call after writing rows to it."""
+    with _gen_lock:
+        _generations[table] = _generations.get(table, 0) + 1
+    shared = _shared_tier()
+    if shared:
+        shared.bump_generation(table)
+
+
+def cache_stats() -> dict:
+    shared = _shared_tier()
+    return {
+        "enabled": CACHE_ENABLED,
+        "embeddings": embedding_cache.stats(),
+        "results": result_cache.stats(),
+        "shared": shared.stats() if shared else None,
+    }
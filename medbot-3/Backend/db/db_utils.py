@@ -1,77 +1,154 @@
 # db/db_utils.py
 import os
+import time
 import logging
-import psycopg2
+import threading
 import numpy as np
-import ast  #  to safely parse embedding strings
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
+from db import embeddings
+from db.pool import get_conn, release_conn
+from db.cache import cached_result, invalidate_table
+from db.quantize import QuantizedMatrix, top_k as top_k_indices
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# How often (seconds) an in-memory index checks its table for new/removed rows
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", "60"))
+# In-memory matrix precision: float32 | float16 | int8 (see db/quantize.py)
+INDEX_DTYPE = os.getenv("INDEX_DTYPE", "float32").lower()
+
+TABLE_MAP = {
+    "symptoms": ("id", "symptom", "answer"),
+    "faqs": ("id", "query", "answer"),
+    "schemes": ("id", "scheme_name_en", "purpose_en"),
+    "risks": ("id", "risk", "answer"),
+}
 
-_model = None
 def get_model():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer("intfloat/multilingual-e5-base")
-        logger.info("[db_utils] Using model intfloat/multilingual-e5-base")
-    return _model
-
-def _parse_embedding(raw):
-    """Convert DB embedding (string or list) to numpy array."""
-    if raw is None:
-        return None
-    if isinstance(raw, list) or isinstance(raw, np.ndarray):
-        return np.array(raw, dtype=float)
-    if isinstance(raw, str):
-        try:
-            parsed = ast.literal_eval(raw)  # safely parse "[0.1,0.2,...]"
-            return np.array(parsed, dtype=float)
-        except Exception:
-            logger.error(f"[db_utils] failed to parse embedding string: {raw[:50]}...")
-            return None
-    return None
+    # Shared registry: the API, the agent and pg_retriever reuse the same model
+    return embeddings.get_model()
 
-def retrieve(table: str, query: str, top_k: int = 3):
-    try:
-        model = get_model()
-        q_emb = model.encode([query])[0]
-
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-
-        table_map = {
-            "symptoms": ("id", "symptom", "answer"),
-            "faqs": ("id", "query", "answer"),
-            "schemes": ("id", "scheme_name_en", "purpose_en"),
-            "risks": ("id", "risk", "answer"),
-        }
-        if table not in table_map:
-            logger.error(f"[db_utils] Invalid table requested: {table}")
-            return []
 
-        id_col, text_col, ans_col = table_map[table]
+class TableIndex:
+    """
+    In-memory embedding index for one table.
+
+    Embeddings live in a contiguous matrix (float32, or float16/int8 with
+    INDEX_DTYPE), with the ids, texts and answers kept in parallel arrays,
+    so a query is one matrix-vector product plus an argpartition top-k and
+    no DB round trip. Rows are stored and queries encoded unit length
+    (db.embeddings), so the dot product is the cosine score and neither side
+    is re-normalized here. The table is reloaded when its write counter in
+    table_generations (db/schema.py) changes, or after invalidate().
+    """
 
-        cur.execute(f"SELECT {id_col}, {text_col}, {ans_col}, embedding FROM {table}")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+    def __init__(self, table: str, dtype: str = INDEX_DTYPE):
+        self.table = table
+        self.dtype = dtype
+        self.ids = np.empty(0, dtype=np.int64)
+        self.texts = np.empty(0, dtype=object)
+        self.answers = np.empty(0, dtype=object)
+        self.matrix = QuantizedMatrix(np.empty((0, 0), dtype=np.float32), dtype)
+        self.signature = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
 
-        sims = []
-        for rid, text, ans, emb in rows:
-            emb_vec = _parse_embedding(emb)
-            if emb_vec is None or not text:
+    def invalidate(self):
+        with self._lock:
+            self.signature = None
+            self.checked_at = 0.0
+
+    def _signature(self, cur):
+        # Bumped by a trigger on every write, in-place upserts included; one
+        # primary-key lookup instead of scanning the table
+        cur.execute("SELECT generation FROM table_generations WHERE tbl = %s", (self.table,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def _load(self, cur):
+        id_col, text_col, ans_col = TABLE_MAP[self.table]
+        # real[] comes back as a plain list of floats, no string parsing needed
+        cur.execute(
+            f"SELECT {id_col}, {text_col}, {ans_col}, embedding::real[] "
+            f"FROM {self.table} WHERE embedding IS NOT NULL"
+        )
+        ids, texts, answers, vectors = [], [], [], []
+        for rid, text, ans, emb in cur.fetchall():
+            if not text or not emb:
                 continue
-            sim = np.dot(q_emb, emb_vec) / (np.linalg.norm(q_emb) * np.linalg.norm(emb_vec) + 1e-9)
-            sims.append((sim, rid, str(text).strip(), str(ans or "").strip()))
+            ids.append(rid)
+            texts.append(str(text).strip())
+            answers.append(str(ans or "").strip())
+            vectors.append(emb)
+
+        matrix = QuantizedMatrix(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1), self.dtype)
 
-        sims.sort(reverse=True, key=lambda x: x[0])
-        top = sims[:top_k]
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.texts = np.asarray(texts, dtype=object)
+        self.answers = np.asarray(answers, dtype=object)
+        self.matrix = matrix
+        logger.info(f"[db_utils] Loaded {len(ids)} rows into {self.table} index "
+                    f"({self.dtype}, {matrix.nbytes / 1e6:.1f} MB)")
+
+    def refresh(self, force: bool = False):
+        """Reload from Postgres if the table changed (checked at most every INDEX_REFRESH_SECONDS)."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.signature is not None and now - self.checked_at < INDEX_REFRESH_SECONDS:
+                return
+            conn = get_conn()
+            try:
+                with conn.cursor() as cur:
+                    signature = self._signature(cur)
+                    if force or signature != self.signature:
+                        self._load(cur)
+                        if self.signature is not None:
+                            # rows changed under us: cached top-k results are stale
+                            invalidate_table(self.table)
+                        self.signature = signature
+            finally:
+                release_conn(conn)
+            self.checked_at = now
+
+    def search(self, q_emb, top_k: int = 3):
+        self.refresh()
+        matrix, ids, texts, answers = self.matrix, self.ids, self.texts, self.answers
+        n = len(ids)
+        if n == 0 or top_k <= 0:
+            return []
+
+        top = top_k_indices(matrix.scores(q_emb), top_k)
+        return [(int(ids[i]), texts[i], answers[i]) for i in top]
+
+    def stats(self) -> dict:
+        return {"rows": len(self.ids), "dtype": self.dtype, "matrix_bytes": self.matrix.nbytes}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(table: str) -> TableIndex:
+    with _indexes_lock:
+        if table not in _indexes:
+            _indexes[table] = TableIndex(table)
+        return _indexes[table]
+
+def invalidate(table: str = None):
+    """Force a reload of one table's index (or all of them) on next search."""
+    for name in ([table] if table else list(_indexes)):
+        if name in _indexes:
+            _indexes[name].invalidate()
+
+def retrieve(table: str, query: str, top_k: int = 3):
+    try:
+        if table not in TABLE_MAP:
+            logger.error(f"[db_utils] Invalid table requested: {table}")
+            return []
 
-        return [(rid, text, ans) for _, rid, text, ans in top]
+        index = get_index(table)
+        return cached_result(table, "db_utils", query, top_k,
+                             lambda: index.search(embeddings.encode_query(query), top_k))
 
     except Exception as e:
         logger.error(f"[db_utils] retrieve error in {table}: {e}")
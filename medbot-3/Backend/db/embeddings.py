@@ -0,0 +1,162 @@
+# db/embeddings.py
+"""
+Process-wide embedding-model registry.
+
+Every caller (main.py endpoints, chatbot.retrieval, db_utils, pg_retriever)
+goes through get_model(), so each process loads a model at most once per
+name. The default name comes from EMB_MODEL. Set EMB_WARMUP_ON_IMPORT=1 to
+load and warm the default model as soon as this module is imported;
+otherwise the API warms it at startup.
+
+encode_query() is the entry point for single query strings. It checks
+the normalized-text embedding cache (db.cache) first. With
+EMB_BATCHING=1 (default), concurrent calls are merged into one
+model.encode call by db.batcher.EmbeddingBatcher (EMB_BATCH_MAX_SIZE,
+EMB_BATCH_WAIT_MS). encode_query_async() checks the same cache and awaits
+the batcher's future directly, so concurrent async requests fill one
+batch; without batching it encodes on a dedicated executor
+(EMB_EXECUTOR_WORKERS). Blocking encodes through the batcher give up after
+EMB_ENCODE_TIMEOUT seconds instead of waiting forever.
+
+Every vector (queries here, rows in db.ingest) is L2-normalized at encode
+time, so similarity is a plain inner product everywhere: pgvector `<#>`
+(which returns the negated dot product) and `matrix @ q` in db_utils.
+
+EMB_BACKEND picks the inference runtime behind the same encode() interface:
+torch (default, SentenceTransformer) or onnx (db.onnx_encoder, an int8
+ONNX Runtime export of the same model, for CPU-only serving).
+EMB_MAX_SEQ_LENGTH caps tokens per text for either backend.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from db.batcher import EmbeddingBatcher
+from db.cache import cache_key, cached_embedding, get_embedding, put_embedding, run_cache_io
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+EMB_MODEL = os.getenv("EMB_MODEL", "intfloat/multilingual-e5-base")
+EMB_BACKEND = os.getenv("EMB_BACKEND", "torch").lower()
+EMB_BACKENDS = ("torch", "onnx")
+EMB_MAX_SEQ_LENGTH = int(os.getenv("EMB_MAX_SEQ_LENGTH", "0"))
+EMB_BATCHING = os.getenv("EMB_BATCHING", "1") == "1"
+EMB_BATCH_MAX_SIZE = int(os.getenv("EMB_BATCH_MAX_SIZE", "16"))
+EMB_BATCH_WAIT_MS = float(os.getenv("EMB_BATCH_WAIT_MS", "3"))
+EMB_EXECUTOR_WORKERS = int(os.getenv("EMB_EXECUTOR_WORKERS", "4"))
+# Upper bound for a blocking encode through the batcher; covers a cold model load
+EMB_ENCODE_TIMEOUT = float(os.getenv("EMB_ENCODE_TIMEOUT", "60"))
+
+_models = {}
+_lock = threading.Lock()
+_batcher = None
+_executor = None
+
+
+def _load(name: str, backend: str):
+    if backend == "onnx":
+        from db.onnx_encoder import load_encoder
+        return load_encoder(name)
+    if backend != "torch":
+        raise ValueError(f"Unsupported EMB_BACKEND: {backend} (expected one of {EMB_BACKENDS})")
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(name)
+    if EMB_MAX_SEQ_LENGTH:
+        model.max_seq_length = EMB_MAX_SEQ_LENGTH
+    return model
+
+
+def get_model(name: str = None, backend: str = None):
+    """
+    Return the shared encoder for `name` (default EMB_MODEL) on `backend`
+    (default EMB_BACKEND): a SentenceTransformer, or an OnnxEncoder with
+    the same encode() interface.
+    """
+    key = (name or EMB_MODEL, backend or EMB_BACKEND)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = _load(*key)
+                _models[key] = model
+                logger.info(f"[embeddings] Loaded model {key[0]} ({key[1]})")
+    return model
+
+
+def warm_up(name: str = None):
+    """Load the model and run one encode so the first real query is not slow."""
+    model = get_model(name)
+    model.encode(["warm up"], normalize_embeddings=True)
+    return model
+
+
+def get_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(
+                    lambda texts: get_model().encode(texts, normalize_embeddings=True),
+                    max_batch=EMB_BATCH_MAX_SIZE,
+                    max_wait_ms=EMB_BATCH_WAIT_MS,
+                )
+    return _batcher
+
+
+def _encode_one(text: str):
+    if EMB_BATCHING:
+        return get_batcher().encode(text, timeout=EMB_ENCODE_TIMEOUT)
+    return get_model().encode(text, normalize_embeddings=True)
+
+
+def encode_query(text: str):
+    """
+    Embed one query string with the default model. Repeated queries are
+    served from the normalized-text embedding cache (db.cache); misses are
+    micro-batched when enabled.
+    """
+    return cached_embedding(text, _encode_one)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=EMB_EXECUTOR_WORKERS,
+                                               thread_name_prefix="embedding")
+    return _executor
+
+
+async def encode_query_async(text: str):
+    """encode_query() for async handlers, without blocking the event loop."""
+    value = await run_cache_io(get_embedding, text)
+    if value is not None:
+        return value
+    key = cache_key(text)
+    if EMB_BATCHING:
+        # No executor hop: every waiting request is queued at once, so batches
+        # are not capped at EMB_EXECUTOR_WORKERS
+        value = await asyncio.wrap_future(get_batcher().submit(key))
+    else:
+        value = await asyncio.get_running_loop().run_in_executor(get_executor(), _encode_one, key)
+    await run_cache_io(put_embedding, text, value)
+    return value
+
+
+def batcher_stats() -> dict:
+    if _batcher is None:
+        return {"enabled": EMB_BATCHING, "batches": 0, "items": 0}
+    return {"enabled": EMB_BATCHING, **_batcher.stats()}
+
+
+def loaded_models():
+    return [f"{name} ({backend})" for name, backend in _models]
+
+
+if os.getenv("EMB_WARMUP_ON_IMPORT", "0") == "1":
+    warm_up()
@@ -1,7 +1,14 @@
 # db/get_dim.py
-from sentence_transformers import SentenceTransformer
+import os
 from dotenv import load_dotenv
 load_dotenv()
-model_name = "intfloat/multilingual-e5-base"
-m = SentenceTransformer(model_name)
-print("Embedding dimension:", m.get_sentence_embedding_dimension())
+
+def main():
+    # Imported here so importing this module doesn't pull in torch
+    from sentence_transformers import SentenceTransformer
+    model_name = os.getenv("EMB_MODEL", "intfloat/multilingual-e5-base")
+    m = SentenceTransformer(model_name)
+    print("Embedding dimension:", m.get_sentence_embedding_dimension())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# db/indexes.py
+"""
+ANN index management for the pgvector embedding tables.
+
+Every table gets one index on `embedding`, either HNSW or IVFFlat. Build
+and search parameters come from the environment; a per-table override
+wins over the global value (e.g. ANN_METHOD_FAQS=ivfflat):
+
+    ANN_METHOD            hnsw | ivfflat          (default hnsw)
+    HNSW_M                links per node          (default 16)
+    HNSW_EF_CONSTRUCTION  build-time candidates   (default 64)
+    HNSW_EF_SEARCH        query-time candidates   (default 40)
+    IVFFLAT_LISTS         inverted lists          (default 100)
+    IVFFLAT_PROBES        lists probed per query  (default 10)
+    VECTOR_STORAGE        vector | halfvec | binary  (default vector)
+    BINARY_RERANK         binary candidates re-ranked at full precision
+                          (default 40; keep hnsw.ef_search >= this)
+
+The embedding column always holds the float32 vector; VECTOR_STORAGE picks
+what the index stores. `halfvec` indexes `embedding::halfvec(dim)` (half
+the index size, near-identical ranking). `binary` indexes
+`binary_quantize(embedding)` (1 bit per dimension, 32x smaller) and
+nearest_sql() re-ranks the BINARY_RERANK Hamming candidates by the exact
+inner product. The query has to repeat the indexed expression, which is
+why the ORDER BY clause comes from order_sql().
+
+Tables in LANGUAGE_TABLES (default faqs,symptoms,risks; their rows carry a
+`language`) also get one partial index per language, e.g.
+idx_faqs_embedding_hi ... WHERE language = 'hi'. A search filtered with
+the same predicate walks a third of the graph.
+
+Embeddings are stored L2-normalized, so the indexes use inner product
+(vector_ip_ops). Queries can only use them when written as
+`ORDER BY embedding <#> q LIMIT k`; ordering by a computed similarity
+forces a sequential scan. `python -m db.indexes --check` EXPLAINs the
+search SQL the API actually runs (chatbot.retrieval.search_sql: hybrid or
+vector-only, per language) and reports whether the matching index is used.
+"""
+import os
+import sys
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Embedding dimension (multilingual-e5-base); quantized index expressions need it
+EMB_DIM = int(os.getenv("EMB_DIM", "768"))
+
+EMBEDDING_TABLES = ("faqs", "schemes", "symptoms", "risks")
+
+# Operator class must match the distance operator used by the queries (<#>)
+OPCLASS = "vector_ip_ops"
+
+STORAGE_MODES = ("vector", "halfvec", "binary")
+
+LANGUAGES = ("en", "hi", "hinglish")
+LANGUAGE_TABLES = tuple(t.strip() for t in os.getenv("LANGUAGE_TABLES", "faqs,symptoms,risks").split(",")
+                        if t.strip())
+
+
+def _env(name: str, table: str, default):
+    return os.getenv(f"{name}_{table.upper()}", os.getenv(name, default))
+
+
+def index_config(table: str) -> dict:
+    """Resolved build/search parameters for one table."""
+    method = str(_env("ANN_METHOD", table, "hnsw")).lower()
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError(f"Unsupported ANN_METHOD for {table}: {method}")
+    storage = str(_env("VECTOR_STORAGE", table, "vector")).lower()
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unsupported VECTOR_STORAGE for {table}: {storage}")
+    return {
+        "method": method,
+        "storage": storage,
+        "rerank": int(_env("BINARY_RERANK", table, 40)),
+        "m": int(_env("HNSW_M", table, 16)),
+        "ef_construction": int(_env("HNSW_EF_CONSTRUCTION", table, 64)),
+        "ef_search": int(_env("HNSW_EF_SEARCH", table, 40)),
+        "lists": int(_env("IVFFLAT_LISTS", table, 100)),
+        "probes": int(_env("IVFFLAT_PROBES", table, 10)),
+    }
+
+
+def index_name(table: str, lang: str = None) -> str:
+    return f"idx_{table}_embedding_{lang}" if lang else f"idx_{table}_embedding"
+
+
+def index_languages(table: str):
+    """None (the whole-table index) plus each language with a partial index."""
+    return [None] + (list(LANGUAGES) if table in LANGUAGE_TABLES else [])
+
+
+def language_predicate(lang: str) -> str:
+    """
+    Inlined rather than bound: the planner only picks a partial index when
+    it can prove the predicate, which a generic prepared plan cannot.
+    """
+    if lang not in LANGUAGES:
+        raise ValueError(f"Unsupported language: {lang}")
+    return f"language = '{lang}'"
+
+
+def index_expression(table: str, dim: int = EMB_DIM) -> str:
+    storage = index_config(table)["storage"]
+    if storage == "halfvec":
+        return f"(embedding::halfvec({dim}))"
+    if storage == "binary":
+        return f"(binary_quantize(embedding)::bit({dim}))"
+    return "embedding"
+
+
+def opclass(table: str) -> str:
+    return {"vector": OPCLASS, "halfvec": "halfvec_ip_ops",
+            "binary": "bit_hamming_ops"}[index_config(table)["storage"]]
+
+
+def order_sql(table: str, dim: int = EMB_DIM) -> str:
+    """ORDER BY expression (query vector as the %(embedding)s parameter) matching the table's index."""
+    storage = index_config(table)["storage"]
+    if storage == "halfvec":
+        return f"embedding::halfvec({dim}) <#> %(embedding)s::halfvec({dim})"
+    if storage == "binary":
+        return f"binary_quantize(embedding)::bit({dim}) <~> binary_quantize(%(embedding)s::vector)"
+    return "embedding <#> %(embedding)s::vector"
+
+
+def create_index_sql(table: str, lang: str = None) -> str:
+    cfg = index_config(table)
+    if cfg["method"] == "hnsw":
+        params = f"m = {cfg['m']}, ef_construction = {cfg['ef_construction']}"
+    else:
+        params = f"lists = {cfg['lists']}"
+    where = f" WHERE {language_predicate(lang)}" if lang else ""
+    return (
+        f"CREATE INDEX IF NOT EXISTS {index_name(table, lang)} ON {table} "
+        f"USING {cfg['method']} ({index_expression(table)} {opclass(table)}) WITH ({params}){where};"
+    )
+
+
+def search_params_sql(table: str) -> str:
+    cfg = index_config(table)
+    if cfg["method"] == "hnsw":
+        return f"SET LOCAL hnsw.ef_search = {cfg['ef_search']};"
+    return f"SET LOCAL ivfflat.probes = {cfg['probes']};"
+
+
+def apply_search_params(cur, table: str):
+    """
+    Set per-query ANN search parameters. SET LOCAL only lasts for the
+    current transaction, so pooled connections are not left modified.
+    """
+    cur.execute(search_params_sql(table))
+
+
+def existing_index(cur, table: str, lang: str = None):
+    """(method, opclass) of the table's (or language's) embedding index, or (None, None)."""
+    cur.execute("""
+        SELECT am.amname, opc.opcname
+        FROM pg_class c
+        JOIN pg_am am ON am.oid = c.relam
+        JOIN pg_index i ON i.indexrelid = c.oid
+        JOIN pg_opclass opc ON opc.oid = i.indclass[0]
+        WHERE c.relname = %s AND c.relkind = 'i';
+    """, (index_name(table, lang),))
+    row = cur.fetchone()
+    return row if row else (None, None)
+
+
+def ensure_indexes(conn, tables=EMBEDDING_TABLES, rebuild: bool = False):
+    """
+    Create the configured ANN index (plus the per-language partial indexes)
+    on each existing table. An index built with a different method or
+    operator class, i.e. a different storage mode (or any index, when
+    rebuild=True), is dropped and recreated. IVFFlat trains its lists on
+    the current rows, so build it after loading data.
+    """
+    with conn.cursor() as cur:
+        for table in tables:
+            cur.execute("SELECT to_regclass(%s);", (table,))
+            if cur.fetchone()[0] is None:
+                print(f"[indexes] Skipping {table}: table does not exist.")
+                continue
+            method = index_config(table)["method"]
+            for lang in index_languages(table):
+                existing, existing_opclass = existing_index(cur, table, lang)
+                if existing and (rebuild or existing != method or existing_opclass != opclass(table)):
+                    cur.execute(f"DROP INDEX IF EXISTS {index_name(table, lang)};")
+                    existing = None
+                if existing is None:
+                    cur.execute(create_index_sql(table, lang))
+                    print(f"[indexes] Built {method} index on {table}" + (f" ({lang})." if lang else "."))
+    conn.commit()
+
+
+def explain_uses_index(conn, table: str, lang: str = None, disable_seqscan: bool = False) -> dict:
+    """
+    EXPLAIN the search SQL the API runs for `table` (filtered to `lang`, if
+    given) and report whether the matching ANN index serves it. Tiny tables
+    are legitimately seq-scanned by the planner; pass disable_seqscan=True
+    to check the shape alone.
+    """
+    from chatbot.retrieval import search_columns, search_sql, sql_params  # the API's own SQL
+
+    report = {"table": table, "language": lang}
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT embedding::text FROM {table} WHERE embedding IS NOT NULL LIMIT 1;")
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return {**report, "uses_index": None, "plan": "table is empty"}
+        apply_search_params(cur, table)
+        if disable_seqscan:
+            cur.execute("SET LOCAL enable_seqscan = off;")
+        cur.execute("EXPLAIN " + search_sql(table, search_columns(table, lang), lang).strip().rstrip(";"),
+                    sql_params(row[0], "sample query", 5))
+        plan = "\n".join(r[0] for r in cur.fetchall())
+    conn.rollback()
+    return {**report, "uses_index": index_name(table, lang) in plan, "plan": plan}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage pgvector ANN indexes.")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN each table's query and report index usage")
+    parser.add_argument("--rebuild", action="store_true", help="drop and recreate every index")
+    parser.add_argument("--force-index", action="store_true", help="disable seq scans while checking")
+    parser.add_argument("tables", nargs="*", default=list(EMBEDDING_TABLES))
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.check:
+            ok = True
+            for table in args.tables:
+                for lang in index_languages(table):
+                    report = explain_uses_index(conn, table, lang, disable_seqscan=args.force_index)
+                    print(f"[indexes] {table} ({lang or 'all languages'}): uses_index={report['uses_index']}")
+                    print(report["plan"])
+                    ok = ok and report["uses_index"] is not False
+            return 0 if ok else 1
+        ensure_indexes(conn, args.tables, rebuild=args.rebuild)
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+# db/ingest.py
+"""
+Bulk-ingestion pipeline shared by the loaders in db/.
+
+For each batch of source items:
+  1. build the row values and the text to embed
+  2. content-hash them and skip rows whose hash is already in the table
+  3. encode the remaining texts in one model.encode(list, batch_size=...)
+  4. binary-COPY rows + float32 vectors into a temp stage table, then
+     INSERT ... SELECT into the real table with the spec's ON CONFLICT clause
+  5. commit, then record the source offset in the checkpoint file
+
+Re-runs are idempotent (unchanged rows hash the same and are skipped
+before any encoding), and an interrupted load resumes from the last
+committed batch.
+
+Sources are streamed (iter_records: JSON arrays parsed incrementally, or
+JSONL), and every stage is a generator, so the whole chain is
+parse -> filter -> batch encode -> batch write, and peak memory depends
+on the batch size, not the corpus size.
+
+load() runs everything in-process; load_parallel() shards the batches
+across a pool of encoder processes that feed one ordered writer.
+
+A table spec is a plain dict:
+    {"table": "faqs",
+     "columns": [("query", "text"), ...],         # excluding content_hash/embedding
+     "conflict": "ON CONFLICT (content_hash) DO NOTHING"}
+`build_row(item)` returns (values_tuple, text_for_embedding) or None to skip.
+"""
+import os
+import json
+import time
+import hashlib
+from psycopg2 import OperationalError, DatabaseError
+
+from db.pgcopy import copy_buffer
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT = os.getenv("LOAD_CHECKPOINT", os.path.join(SCRIPT_DIR, ".load_checkpoint.json"))
+
+
+# ---------------- Streaming sources ----------------
+def _iter_json_array(f, chunk_size: int = 1 << 16):
+    """
+    Incrementally decode the elements of a top-level JSON array, reading
+    `chunk_size` characters at a time (stdlib fallback when ijson is absent).
+    """
+    decoder = json.JSONDecoder()
+    buf, eof = "", False
+
+    def more():
+        nonlocal buf, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+    while not buf.lstrip() and not eof:
+        more()
+    buf = buf.lstrip()
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array")
+    buf = buf[1:]
+
+    while True:
+        buf = buf.lstrip()
+        if buf.startswith(","):
+            buf = buf[1:].lstrip()
+        if buf.startswith("]"):
+            return
+        if not buf or buf.isspace():
+            if eof:
+                raise ValueError("unterminated JSON array")
+            more()
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more()
+            continue
+        if end == len(buf) and not eof:
+            # a scalar could continue past the buffer; make sure it is complete
+            more()
+            continue
+        yield obj
+        buf = buf[end:]
+
+
+def iter_records(path: str):
+    """
+    Yield records one at a time from a JSON array file or a JSONL file
+    (.jsonl / .ndjson), so memory stays bounded by the batch size rather
+    than the corpus size. Uses ijson for arrays when it is installed.
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        return
+
+    try:
+        import ijson  # optional, C-accelerated incremental parser
+    except ImportError:
+        ijson = None
+    if ijson is not None:
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "item", use_float=True)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _iter_json_array(f)
+
+
+def content_hash(table: str, values, text: str) -> str:
+    payload = json.dumps([table, list(values), text], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """JSON file mapping a source key (table + file identity) to rows already committed."""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT):
+        self.path = path
+        self.data = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                print(f"[ingest] Ignoring unreadable checkpoint {path}")
+
+    @staticmethod
+    def source_key(table: str, path: str) -> str:
+        st = os.stat(path)
+        return f"{table}:{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+    def offset(self, key: str) -> int:
+        return int(self.data.get(key, 0))
+
+    def _write(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def save(self, key: str, offset: int):
+        self.data[key] = offset
+        self._write()
+
+    def clear(self, key: str = None):
+        if key is None:
+            self.data = {}
+        else:
+            self.data.pop(key, None)
+        self._write()
+
+
+def existing_hashes(cur, table: str, hashes):
+    cur.execute(f"SELECT content_hash FROM {table} WHERE content_hash = ANY(%s)", (list(hashes),))
+    return {r[0] for r in cur.fetchall()}
+
+
+def copy_upsert(cur, spec: dict, rows) -> int:
+    """Binary-COPY `rows` (values..., content_hash, embedding) into a stage table and upsert."""
+    table = spec["table"]
+    names = [c for c, _ in spec["columns"]] + ["content_hash", "embedding"]
+    types = [t for _, t in spec["columns"]] + ["text", "vector"]
+    cols = ", ".join(names)
+    stage = f"_stage_{table}"
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA;")
+    cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN WITH (FORMAT binary)", copy_buffer(rows, types))
+    cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} {spec['conflict']};")
+    return max(cur.rowcount, 0)
+
+
+def prepare_batch(spec: dict, items, build_row):
+    """Rows for one batch: [(values, text, hash)], de-duplicated within the batch."""
+    rows, seen = [], set()
+    for item in items:
+        built = build_row(item)
+        if not built:
+            continue
+        values, text = built
+        h = content_hash(spec["table"], values, text)
+        if h in seen:
+            continue
+        seen.add(h)
+        rows.append((tuple(values), text, h))
+    return rows
+
+
+def write_batch(get_conn, conn, spec: dict, rows, embeddings, max_retries: int = 3, retry_backoff: float = 2.0):
+    """Upsert one encoded batch and commit, reconnecting on transient DB errors. Returns (conn, inserted)."""
+    payload = [values + (h, emb) for (values, _, h), emb in zip(rows, embeddings)]
+    attempt = 0
+    while True:
+        try:
+            with conn.cursor() as cur:
+                inserted = copy_upsert(cur, spec, payload)
+            conn.commit()
+            return conn, inserted
+        except (OperationalError, DatabaseError) as e:
+            attempt += 1
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[ingest] DB error on {spec['table']} (attempt {attempt}/{max_retries}): {e}")
+            if attempt >= max_retries:
+                raise
+            try:
+                conn.close()
+            except Exception:
+                pass
+            time.sleep(retry_backoff * attempt)
+            conn = get_conn()
+
+
+def _read_batches(get_conn, spec: dict, items, build_row, start: int, batch_size: int):
+    """
+    Yield (offset, rows, unchanged) per source batch: items before `start`
+    are skipped, and rows whose content hash is already stored are dropped
+    before they reach the encoder.
+    """
+    table = spec["table"]
+    conn = get_conn()
+    try:
+        offset = 0
+        for batch in chunked(items, batch_size):
+            offset += len(batch)
+            if offset <= start:
+                continue
+            if offset - len(batch) < start:
+                batch = batch[start - (offset - len(batch)):]
+
+            rows = prepare_batch(spec, batch, build_row)
+            unchanged = 0
+            if rows:
+                with conn.cursor() as cur:
+                    known = existing_hashes(cur, table, [h for _, _, h in rows])
+                conn.rollback()
+                unchanged = len(known)
+                rows = [r for r in rows if r[2] not in known]
+            yield offset, rows, unchanged
+    finally:
+        conn.close()
+
+
+class _Progress:
+    def __init__(self, table: str):
+        self.table = table
+        self.inserted = 0
+        self.unchanged = 0
+        self.encoded = 0
+        self.started = time.perf_counter()
+
+    def report(self, offset: int):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(f"[ingest] {self.table}: {offset} items read, {self.inserted} inserted, "
+              f"{self.unchanged} unchanged ({offset / elapsed:.1f} rows/s read, "
+              f"{self.encoded / elapsed:.1f} rows/s encoded)")
+
+
+def load(get_conn, model, spec: dict, items, build_row, source_key: str = None,
+         checkpoint: Checkpoint = None, batch_size: int = 256, encode_batch_size: int = 64):
+    """
+    Run the pipeline over `items` (a list or any iterable) in this process.
+    With a checkpoint + source_key, items already committed by an earlier
+    run are skipped and progress is saved after every batch.
+    """
+    table = spec["table"]
+    start = checkpoint.offset(source_key) if checkpoint and source_key else 0
+    if start:
+        print(f"[ingest] {table}: resuming after {start} items")
+
+    progress = _Progress(table)
+    conn = get_conn()
+    try:
+        for offset, rows, unchanged in _read_batches(get_conn, spec, items, build_row, start, batch_size):
+            progress.unchanged += unchanged
+            if rows:
+                embeddings = model.encode([text for _, text, _ in rows], batch_size=encode_batch_size,
+                                          convert_to_numpy=True, normalize_embeddings=True,
+                                          show_progress_bar=False)
+                progress.encoded += len(rows)
+                conn, n = write_batch(get_conn, conn, spec, rows, embeddings)
+                progress.inserted += n
+
+            if checkpoint and source_key:
+                checkpoint.save(source_key, offset)
+            progress.report(offset)
+    finally:
+        conn.close()
+
+    if checkpoint and source_key:
+        checkpoint.clear(source_key)
+    return progress.inserted
+
+
+# ---------------- Parallel (multi-process) mode ----------------
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Process-pool initializer: each worker loads the model once, with its share of the cores."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(max(1, threads))
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_shard(texts, encode_batch_size: int):
+    return _worker_model.encode(texts, batch_size=encode_batch_size,
+                                convert_to_numpy=True, normalize_embeddings=True,
+                                show_progress_bar=False)
+
+
+def load_parallel(get_conn, model_name: str, spec: dict, items, build_row, workers: int,
+                  source_key: str = None, checkpoint: Checkpoint = None,
+                  batch_size: int = 256, encode_batch_size: int = 64):
+    """
+    Same pipeline as load(), but each batch (shard) is encoded by one of
+    `workers` processes while the main process keeps reading. Encoded
+    shards are handed, in source order, to a single writer thread over a
+    bounded queue, so checkpoints stay monotonic and memory stays bounded
+    by roughly 2 * workers shards.
+    """
+    import queue
+    import threading
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    table = spec["table"]
+    start = checkpoint.offset(source_key) if checkpoint and source_key else 0
+    if start:
+        print(f"[ingest] {table}: resuming after {start} items")
+
+    progress = _Progress(table)
+    pending = queue.Queue(maxsize=max(2, 2 * workers))
+    errors = []
+
+    def writer():
+        conn = get_conn()
+        try:
+            while True:
+                job = pending.get()
+                if job is None:
+                    return
+                offset, rows, future = job
+                if errors:
+                    continue  # drain after a failure
+                try:
+                    if rows:
+                        embeddings = future.result()
+                        progress.encoded += len(rows)
+                        conn, n = write_batch(get_conn, conn, spec, rows, embeddings)
+                        progress.inserted += n
+                    if checkpoint and source_key:
+                        checkpoint.save(source_key, offset)
+                    progress.report(offset)
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            conn.close()
+
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    ctx = multiprocessing.get_context("spawn")  # torch is not fork-safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(model_name, threads)) as pool:
+        writer_thread = threading.Thread(target=writer, name=f"ingest-writer-{table}", daemon=True)
+        writer_thread.start()
+        try:
+            for offset, rows, unchanged in _read_batches(get_conn, spec, items, build_row, start, batch_size):
+                if errors:
+                    break
+                progress.unchanged += unchanged
+                future = pool.submit(_encode_shard, [t for _, t, _ in rows], encode_batch_size) if rows else None
+                pending.put((offset, rows, future))  # blocks when the writer falls behind
+        finally:
+            pending.put(None)
+            writer_thread.join()
+
+    if errors:
+        raise errors[0]
+    if checkpoint and source_key:
+        checkpoint.clear(source_key)
+    return progress.inserted
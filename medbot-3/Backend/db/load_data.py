@@ -1,21 +1,33 @@
 # db/load_data.py
 """
-Robust loader: inserts FAQs, schemes and symptoms into Postgres (pgvector).
-Uses sentence-transformers for embeddings and psycopg2.extras.execute_values
-to perform chunked, efficient bulk inserts with retry logic.
+Robust loader: inserts FAQs, schemes, symptoms and risks into Postgres (pgvector).
+
+Built on the db/ingest.py pipeline:
+  - texts are embedded in large batches (model.encode(list, batch_size=...))
+  - rows + float32 vectors go in via binary COPY (no text vector literals)
+  - every row carries a content hash, so re-runs skip unchanged rows
+  - progress is checkpointed, so an interrupted load resumes where it stopped
+
+  - --workers N encodes shards in N processes feeding one ordered writer
+  - inputs are streamed (JSON arrays parsed incrementally, or JSONL), so
+    memory is bounded by the batch size, not the corpus size
+
+Table definitions live in db/schema.py; this loader only migrates to the
+current schema version before inserting.
+
+Run from the Backend directory: python -m db.load_data [--help]
 """
 
 import os
 import sys
-import json
-import time
-import math
+import hashlib
+import argparse
 import psycopg2
-from psycopg2.extras import execute_values
-from psycopg2 import OperationalError, DatabaseError
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+from db.indexes import ensure_indexes
+from db.cache import invalidate_table
+from db.embeddings import get_model
+from db import ingest, schema
 
 # Load environment
 load_dotenv()
@@ -23,16 +35,33 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set in .env")
 
-# Embedding model
+# Embedding model (loaded on first use: parallel-mode workers re-import
+# this module and load their own copy, so the import itself stays cheap)
 MODEL_NAME = os.getenv("EMB_MODEL", "intfloat/multilingual-e5-base")
-print(f"[load_data] Loading embedding model: {MODEL_NAME} ...")
-try:
-    model = SentenceTransformer(MODEL_NAME)
-except Exception as e:
-    print(f"[load_data] ERROR loading model {MODEL_NAME}: {e}")
-    raise
-embedding_dim = model.get_sentence_embedding_dimension()
-print(f"[load_data] Using embedding model {MODEL_NAME} (dim={embedding_dim})")
+# Set EMB_DIM to create tables without loading the model in the parent process
+EMBEDDING_DIM = os.getenv("EMB_DIM")
+
+def loader_model():
+    print(f"[load_data] Loading embedding model: {MODEL_NAME} ...")
+    try:
+        # Stored vectors always come from the reference torch model
+        model = get_model(MODEL_NAME, backend="torch")
+    except Exception as e:
+        print(f"[load_data] ERROR loading model {MODEL_NAME}: {e}")
+        raise
+    print(f"[load_data] Using embedding model {MODEL_NAME} (dim={model.get_sentence_embedding_dimension()})")
+    return model
+
+def embedding_dim() -> int:
+    if EMBEDDING_DIM:
+        return int(EMBEDDING_DIM)
+    return loader_model().get_sentence_embedding_dimension()
+
+# Batch sizes: rows per COPY/commit, and texts per forward pass
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "512"))
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+# Encoder processes (1 = encode in this process)
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "1"))
 
 # DB connection helper
 def get_conn():
@@ -43,266 +72,180 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # .../db
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 
-# Create tables + extension
+# Create / upgrade tables (db/schema.py), without the ANN indexes
 def create_tables():
+    dim = embedding_dim()
     conn = get_conn()
-    cur = conn.cursor()
     try:
-        # ensure pgvector extension exists
-        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-        # faqs
-        cur.execute(f"""
-        CREATE TABLE IF NOT EXISTS faqs (
-            id SERIAL PRIMARY KEY,
-            query TEXT NOT NULL,
-            intent TEXT,
-            entity TEXT,
-            answer TEXT,
-            language TEXT,
-            source TEXT,
-            embedding vector({embedding_dim})
-        );
-        """)
-        # schemes
-        cur.execute(f"""
-        CREATE TABLE IF NOT EXISTS schemes (
-            id SERIAL PRIMARY KEY,
-            scheme_name_en TEXT,
-            scheme_name_hi TEXT,
-            scheme_name_hinglish TEXT,
-            purpose_en TEXT,
-            purpose_hi TEXT,
-            purpose_hinglish TEXT,
-            keywords TEXT[],
-            embedding vector({embedding_dim})
-        );
-        """)
-        # symptoms
-        cur.execute(f"""
-        CREATE TABLE IF NOT EXISTS symptoms (
-            id BIGINT PRIMARY KEY,
-            symptom TEXT NOT NULL,
-            answer TEXT,
-            source TEXT,
-            embedding vector({embedding_dim})
-        );
-        """)
-        conn.commit()
-        # Optional: create ivfflat index for faster ANN (uncomment and tune lists=n)
-        # cur.execute("CREATE INDEX IF NOT EXISTS idx_faqs_embedding ON faqs USING ivfflat (embedding) WITH (lists = 100);")
-        # cur.execute("CREATE INDEX IF NOT EXISTS idx_schemes_embedding ON schemes USING ivfflat (embedding) WITH (lists = 100);")
-        # cur.execute("CREATE INDEX IF NOT EXISTS idx_symptoms_embedding ON symptoms USING ivfflat (embedding) WITH (lists = 100);")
-        # conn.commit()
-        print("[create_tables] Tables (and extension) ensured.")
+        version = schema.migrate(conn, dim, with_indexes=False)
+        print(f"[create_tables] Schema at version {version} (dim={dim}).")
     finally:
-        cur.close()
         conn.close()
 
-# util: chunking
-def chunked(seq, size):
-    for i in range(0, len(seq), size):
-        yield seq[i:i + size]
-
-# safe bulk insert using execute_values with template that casts last field to vector
-def safe_insert(conn, cur, insert_sql_template, rows, batch_size=100, max_retries=3, retry_backoff=2.0):
-    """
-    - conn, cur: active psycopg2 connection & cursor
-    - insert_sql_template: "INSERT INTO table (c1,c2,c3,embedding) VALUES %s"
-    - rows: list of tuples where the last element is a vector literal string like "[0.1,0.2,...]"
-    - batch_size: number rows per execute_values call
-    """
-    if not rows:
-        return 0
-
-    # template: map row tuple to SQL values; last column cast to vector
-    # Example: "(%s, %s, %s, %s::vector)"
-    # Number of %s must match number of columns in the tuple
-    num_cols = len(rows[0])
-    if num_cols < 1:
-        raise ValueError("Rows must have at least one column")
-
-    # build template where last placeholder is cast to vector
-    placeholders = ", ".join(["%s"] * num_cols)
-    # replace last %s with %s::vector
-    placeholders = placeholders.rsplit("%s", 1)
-    template = "(" + placeholders[0] + "%s::vector" + ")"
-
-    total_inserted = 0
-    for chunk in chunked(rows, batch_size):
-        attempt = 0
-        while True:
-            try:
-                # execute_values will fill VALUES %s with many tuples using the template
-                execute_values(cur, insert_sql_template, chunk, template=template)
-                conn.commit()
-                total_inserted += len(chunk)
-                break
-            except (OperationalError, DatabaseError) as e:
-                attempt += 1
-                conn.rollback()
-                print(f"[safe_insert] DB error (attempt {attempt}/{max_retries}): {e}")
-                if attempt >= max_retries:
-                    print("[safe_insert] Max retries reached — re-raising.")
-                    raise
-                # try to reconnect if connection closed
-                try:
-                    cur.close()
-                except Exception:
-                    pass
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-                time.sleep(retry_backoff * attempt)
-                # recreate connection & cursor
-                conn = get_conn()
-                cur = conn.cursor()
-    return total_inserted
-
-# helper to convert embedding (ndarray/list) to pgvector literal string
-def emb_to_literal(emb):
-    # ensure Python floats and stable formatting
-    return "[" + ",".join(str(float(x)) for x in emb) + "]"
-
-# Insert FAQs
-def insert_faqs(batch_size=200):
-    path = os.path.join(DATA_DIR, "master_dataset.json")
-    if not os.path.isfile(path):
-        print(f"[insert_faqs] File not found: {path}")
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        faqs = json.load(f)
-
-    print(f"[insert_faqs] Inserting {len(faqs)} FAQs...")
-    rows = []
-    for item in tqdm(faqs, desc="faqs", ncols=100):
-        q = item.get("query")
-        a = item.get("answer")
-        if not q or not a:
-            continue
-        intent = item.get("intent")
-        entity = item.get("entity")
-        lang = item.get("language")
-        src = item.get("source", "N/A")
-        # Use combined text optionally (query+answer) for embedding — change as needed
-        text_for_emb = q + " " + (a or "")
-        emb = model.encode(text_for_emb)
-        emb_lit = emb_to_literal(emb)
-        rows.append((q, intent, entity, a, lang, src, emb_lit))
-
-    if not rows:
-        print("[insert_faqs] No rows to insert.")
-        return
-
+# ANN indexes (HNSW / IVFFlat, see db/indexes.py). Built after inserts so
+# IVFFlat lists are trained on real data and bulk loads skip index upkeep.
+# The lexical stop words are recounted from the loaded rows at the same time.
+def create_indexes():
     conn = get_conn()
-    cur = conn.cursor()
     try:
-        insert_sql = "INSERT INTO faqs (query, intent, entity, answer, language, source, embedding) VALUES %s"
-        inserted = safe_insert(conn, cur, insert_sql, rows, batch_size=batch_size)
-        print(f"[insert_faqs] Inserted {inserted} faq rows.")
+        ensure_indexes(conn)
+        print("[create_indexes] ANN indexes ensured.")
+        with conn.cursor() as cur:
+            schema.refresh_lexical_stopwords(cur)
+        conn.commit()
+        print("[create_indexes] Lexical stop words refreshed.")
     finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+        conn.close()
 
-# Insert Schemes
-def insert_schemes(batch_size=50):
-    path = os.path.join(DATA_DIR, "govt.scheme.json")
+# ---------------- Table specs ----------------
+FAQ_SPEC = {
+    "table": "faqs",
+    "columns": [("query", "text"), ("intent", "text"), ("entity", "text"),
+                ("answer", "text"), ("language", "text"), ("source", "text")],
+    "conflict": "ON CONFLICT (content_hash) DO NOTHING",
+}
+
+SCHEME_SPEC = {
+    "table": "schemes",
+    "columns": [("scheme_name_en", "text"), ("scheme_name_hi", "text"), ("scheme_name_hinglish", "text"),
+                ("purpose_en", "text"), ("purpose_hi", "text"), ("purpose_hinglish", "text"),
+                ("keywords", "text[]")],
+    "conflict": "ON CONFLICT (content_hash) DO NOTHING",
+}
+
+# symptoms have a natural key (id): changed content replaces the old row
+SYMPTOM_SPEC = {
+    "table": "symptoms",
+    "columns": [("id", "int8"), ("symptom", "text"), ("answer", "text"), ("language", "text"), ("source", "text")],
+    "conflict": """
+        ON CONFLICT (id) DO UPDATE SET
+            symptom = EXCLUDED.symptom, answer = EXCLUDED.answer,
+            language = EXCLUDED.language, source = EXCLUDED.source,
+            content_hash = EXCLUDED.content_hash, embedding = EXCLUDED.embedding
+        WHERE symptoms.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    """,
+}
+
+RISK_SPEC = {
+    "table": "risks",
+    "columns": [("risk", "text"), ("answer", "text"), ("language", "text"), ("source", "text")],
+    "conflict": "ON CONFLICT (content_hash) DO NOTHING",
+}
+
+def faq_row(item):
+    q = item.get("query")
+    a = item.get("answer")
+    if not q or not a:
+        return None
+    values = (q, item.get("intent"), item.get("entity"), a, item.get("language"), item.get("source", "N/A"))
+    # Use combined text optionally (query+answer) for embedding — change as needed
+    return values, q + " " + (a or "")
+
+def scheme_row(item):
+    name_en = item.get("scheme_name_en")
+    purpose_en = item.get("purpose_en")
+    values = (name_en, item.get("scheme_name_hi"), item.get("scheme_name_hinglish"),
+              purpose_en, item.get("purpose_hi"), item.get("purpose_hinglish"),
+              item.get("keywords", []))
+    return values, (name_en or "") + " " + (purpose_en or "")
+
+def stable_id(text: str) -> int:
+    # hash() is salted per process; sha256 keeps generated ids stable across runs
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:12], 16) % (10 ** 12)
+
+def symptom_row(item):
+    symptom_text = item.get("query") or item.get("symptom")
+    if not symptom_text:
+        return None
+    # use provided id if present, else a stable hash-based id to avoid collisions
+    provided_id = item.get("id")
+    if provided_id is None:
+        provided_id = stable_id(symptom_text)
+    values = (provided_id, symptom_text, item.get("answer", ""), item.get("language"), item.get("source", ""))
+    return values, symptom_text
+
+def risk_row(item):
+    risk_text = item.get("risk") or item.get("query")
+    if not risk_text:
+        return None
+    values = (risk_text, item.get("answer", ""), item.get("language"), item.get("source", ""))
+    return values, risk_text
+
+# ---------------- Loading ----------------
+def _load_file(name, filename, spec, build_row, checkpoint=None, batch_size=None, workers=None, path=None):
+    path = path or os.path.join(DATA_DIR, filename)
     if not os.path.isfile(path):
-        print(f"[insert_schemes] File not found: {path}")
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        schemes = json.load(f)
-
-    print(f"[insert_schemes] Inserting {len(schemes)} schemes...")
-    rows = []
-    for item in tqdm(schemes, desc="schemes", ncols=100):
-        name_en = item.get("scheme_name_en")
-        name_hi = item.get("scheme_name_hi")
-        name_hing = item.get("scheme_name_hinglish")
-        purpose_en = item.get("purpose_en")
-        purpose_hi = item.get("purpose_hi")
-        purpose_hing = item.get("purpose_hinglish")
-        keywords = item.get("keywords", [])
-        text_for_emb = (name_en or "") + " " + (purpose_en or "")
-        emb = model.encode(text_for_emb)
-        emb_lit = emb_to_literal(emb)
-        rows.append((name_en, name_hi, name_hing, purpose_en, purpose_hi, purpose_hing, keywords, emb_lit))
-
-    if not rows:
-        print("[insert_schemes] No rows to insert.")
-        return
+        print(f"[{name}] File not found: {path}")
+        return 0
+    # parse -> filter -> batch encode -> batch write, all lazily
+    items = ingest.iter_records(path)
+
+    workers = workers or LOAD_WORKERS
+    print(f"[{name}] Streaming {os.path.basename(path)} ({workers} encoder process(es))...")
+    key = ingest.Checkpoint.source_key(spec["table"], path)
+    options = dict(source_key=key, checkpoint=checkpoint,
+                   batch_size=batch_size or LOAD_BATCH_SIZE, encode_batch_size=ENCODE_BATCH_SIZE)
+    if workers > 1:
+        inserted = ingest.load_parallel(get_conn, MODEL_NAME, spec, items, build_row, workers, **options)
+    else:
+        inserted = ingest.load(get_conn, loader_model(), spec, items, build_row, **options)
+    print(f"[{name}] Inserted {inserted} {spec['table']} rows.")
+    invalidate_table(spec["table"])
+    return inserted
 
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        insert_sql = """
-        INSERT INTO schemes (
-            scheme_name_en, scheme_name_hi, scheme_name_hinglish,
-            purpose_en, purpose_hi, purpose_hinglish, keywords, embedding
-        ) VALUES %s
-        """
-        inserted = safe_insert(conn, cur, insert_sql, rows, batch_size=batch_size)
-        print(f"[insert_schemes] Inserted {inserted} scheme rows.")
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+# Insert FAQs
+def insert_faqs(batch_size=None, checkpoint=None, workers=None, path=None):
+    return _load_file("insert_faqs", "master_dataset.json", FAQ_SPEC, faq_row, checkpoint, batch_size, workers, path)
 
-# Insert Symptoms
-def insert_symptoms(batch_size=200):
-    path = os.path.join(DATA_DIR, "symptoms.json")
-    if not os.path.isfile(path):
-        print(f"[insert_symptoms] File not found: {path}")
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        symptoms = json.load(f)
-
-    print(f"[insert_symptoms] Inserting {len(symptoms)} symptoms...")
-    rows = []
-    for item in tqdm(symptoms, desc="symptoms", ncols=100):
-        symptom_text = item.get("query") or item.get("symptom")
-        if not symptom_text:
-            continue
-        answer_text = item.get("answer", "")
-        source_text = item.get("source", "")
-        # use provided id if present, else compute a hash-based id to avoid collisions
-        provided_id = item.get("id")
-        if provided_id is None:
-            # create stable numeric id from hash if id missing
-            provided_id = abs(hash(symptom_text)) % (10 ** 12)
-        emb = model.encode(symptom_text)
-        emb_lit = emb_to_literal(emb)
-        rows.append((provided_id, symptom_text, answer_text, source_text, emb_lit))
-
-    if not rows:
-        print("[insert_symptoms] No rows to insert.")
-        return
+# Insert Schemes
+def insert_schemes(batch_size=None, checkpoint=None, workers=None, path=None):
+    return _load_file("insert_schemes", "govt.scheme.json", SCHEME_SPEC, scheme_row, checkpoint, batch_size, workers, path)
 
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        insert_sql = """
-        INSERT INTO symptoms (id, symptom, answer, source, embedding)
-        VALUES %s
-        ON CONFLICT (id) DO NOTHING
-        """
-        inserted = safe_insert(conn, cur, insert_sql, rows, batch_size=batch_size)
-        print(f"[insert_symptoms] Inserted {inserted} symptom rows.")
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+# Insert Symptoms
+def insert_symptoms(batch_size=None, checkpoint=None, workers=None, path=None):
+    return _load_file("insert_symptoms", "symptoms.json", SYMPTOM_SPEC, symptom_row, checkpoint, batch_size, workers, path)
+
+# Insert Risks (data/risks.json: [{"risk", "answer", "language", "source"}])
+def insert_risks(batch_size=None, checkpoint=None, workers=None, path=None):
+    return _load_file("insert_risks", "risks.json", RISK_SPEC, risk_row, checkpoint, batch_size, workers, path)
+
+# table -> (spec, build_row); db/schema.py hashes pre-existing rows with these
+ROW_BUILDERS = {
+    "faqs": (FAQ_SPEC, faq_row),
+    "schemes": (SCHEME_SPEC, scheme_row),
+    "symptoms": (SYMPTOM_SPEC, symptom_row),
+    "risks": (RISK_SPEC, risk_row),
+}
+
+LOADERS = {
+    "faqs": insert_faqs,
+    "schemes": insert_schemes,
+    "symptoms": insert_symptoms,
+    "risks": insert_risks,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load FAQs, schemes, symptoms and risks into Postgres.")
+    parser.add_argument("tables", nargs="*", default=list(LOADERS), choices=list(LOADERS))
+    parser.add_argument("--batch-size", type=int, default=LOAD_BATCH_SIZE, help="rows per COPY + commit")
+    parser.add_argument("--checkpoint", default=ingest.DEFAULT_CHECKPOINT, help="checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="ignore and clear any saved checkpoint")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="encoder processes (1 = in-process)")
+    for table in LOADERS:
+        parser.add_argument(f"--{table}-path", default=None, help=f"JSON array or JSONL file for {table}")
+    args = parser.parse_args(argv)
+
+    checkpoint = ingest.Checkpoint(args.checkpoint)
+    if args.reset:
+        checkpoint.clear()
 
-if __name__ == "__main__":
     create_tables()
-    insert_faqs()
-    insert_schemes()
-    insert_symptoms()
+    for table in args.tables:
+        LOADERS[table](batch_size=args.batch_size, checkpoint=checkpoint, workers=args.workers,
+                       path=getattr(args, f"{table}_path"))
+    create_indexes()
     print("✅ All data insertion attempts finished.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,31 @@
 # db/load_symptoms.py
-import os, json
-from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-import psycopg2
-from psycopg2.extras import execute_batch
-from tqdm import tqdm
+# Symptoms-only loader. Shares the batched, resumable pipeline (and table
+# definitions) with db/load_data.py, including the --workers parallel mode.
+# Run from the Backend directory: python -m db.load_symptoms [--workers N] [path]
+import sys
+import argparse
+from db import load_data, ingest
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-EMB_MODEL = os.getenv("EMB_MODEL", "intfloat/multilingual-e5-base")
-BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "64"))
-
-model = SentenceTransformer(EMB_MODEL)
-EMB_DIM = model.get_sentence_embedding_dimension()
-print("[load_symptoms] Using embedding model", EMB_MODEL, "dim=", EMB_DIM)
+def create_table():
+    load_data.create_tables()
+    print("[load_symptoms] Table ready.")
 
-def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+def insert_data(path=None, workers=None, batch_size=None, checkpoint=None):
+    inserted = load_data.insert_symptoms(batch_size=batch_size, checkpoint=checkpoint, workers=workers, path=path)
+    print("[load_symptoms] Data inserted.")
+    return inserted
 
-def create_table():
-    conn = get_conn(); cur=conn.cursor()
-    cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS symptoms (
-        id SERIAL PRIMARY KEY,
-        symptom TEXT,
-        answer TEXT,
-        source TEXT,
-        embedding vector({EMB_DIM})
-    );""")
-    conn.commit(); cur.close(); conn.close(); print("[load_symptoms] Table ready.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load symptoms.json into Postgres.")
+    parser.add_argument("path", nargs="?", default=None, help="defaults to data/symptoms.json")
+    parser.add_argument("--workers", type=int, default=load_data.LOAD_WORKERS, help="encoder processes (1 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=load_data.LOAD_BATCH_SIZE)
+    args = parser.parse_args(argv)
 
-def insert_data(path="../data/symptoms.json"):
-    if not os.path.exists(path):
-        print("symptoms.json not found at", path); return
-    with open(path, "r", encoding="utf-8") as f:
-        items = json.load(f)
-    conn = get_conn(); cur = conn.cursor()
-    rows = []
-    for it in tqdm(items, desc="symptoms"):
-        symptom_text = it.get("query") or it.get("symptom") or ""
-        ans = it.get("answer","")
-        emb = model.encode(symptom_text).tolist()
-        rows.append((symptom_text, ans, it.get("source",""), emb))
-        if len(rows) >= BATCH_SIZE:
-            execute_batch(cur, "INSERT INTO symptoms (symptom,answer,source,embedding) VALUES (%s,%s,%s,%s)", rows, page_size=BATCH_SIZE)
-            conn.commit(); rows=[]
-    if rows:
-        execute_batch(cur, "INSERT INTO symptoms (symptom,answer,source,embedding) VALUES (%s,%s,%s,%s)", rows, page_size=BATCH_SIZE)
-        conn.commit()
-    cur.close(); conn.close(); print("[load_symptoms] Data inserted.")
+    create_table()
+    insert_data(args.path, workers=args.workers, batch_size=args.batch_size, checkpoint=ingest.Checkpoint())
+    load_data.create_indexes()
+    return 0
 
 if __name__ == "__main__":
-    create_table()
-    insert_data()
+    sys.exit(main())
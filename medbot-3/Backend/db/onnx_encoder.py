@@ -0,0 +1,194 @@
+# db/onnx_encoder.py
+"""
+ONNX Runtime backend for the embedding model (EMB_BACKEND=onnx).
+
+PyTorch inference of the encoder dominates query latency on our CPU-only
+nodes. This module exports the model's transformer to ONNX, applies
+dynamic int8 quantization (per-channel weights), and serves it through
+OnnxEncoder. OnnxEncoder offers the SentenceTransformer.encode() subset
+the rest of the code uses, so db.embeddings.get_model() can hand out
+either backend. Tokenization, pooling (mean or CLS) and the final
+Normalize step mirror the exported SentenceTransformer.
+
+    python -m db.onnx_encoder export [--model NAME] [--out DIR] [--no-quantize] [--reduce-range]
+
+Export needs torch and sentence-transformers. Serving needs only
+onnxruntime and transformers (for the tokenizer).
+
+    ONNX_MODEL_DIR           export directory (default db/.onnx/<model>)
+    ONNX_QUANTIZED=0         serve model.onnx instead of model_int8.onnx
+    ONNX_INTRA_OP_THREADS    threads per inference call (0 = ORT default:
+                             one per physical core)
+    EMB_MAX_SEQ_LENGTH       token limit per text (0 = the model's own)
+
+python -m bench.onnx_encoder checks parity (cosine against the torch
+embeddings) and compares p50/p99 latency.
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "1") == "1"
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+EMB_MAX_SEQ_LENGTH = int(os.getenv("EMB_MAX_SEQ_LENGTH", "0"))
+
+CONFIG_FILE = "encoder.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def model_dir(name: str) -> str:
+    default = os.path.join(BACKEND_DIR, "db", ".onnx", name.replace("/", "__"))
+    return os.getenv("ONNX_MODEL_DIR", default)
+
+
+def _pooling_mode(module) -> str:
+    # sentence-transformers < 5 exposes get_pooling_mode_str(), newer ones pooling_mode
+    if hasattr(module, "get_pooling_mode_str"):
+        return module.get_pooling_mode_str()
+    return getattr(module, "pooling_mode", "mean")
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible encode() over an exported ONNX model."""
+
+    def __init__(self, path: str, quantized: bool = ONNX_QUANTIZED,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS, max_seq_length: int = EMB_MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        with open(os.path.join(path, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        if self.config["pooling"] not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling for the ONNX backend: {self.config['pooling']}")
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.max_seq_length = max_seq_length or self.config["max_seq_length"]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.model_file = INT8_FILE if quantized else FP32_FILE
+        self.session = ort.InferenceSession(os.path.join(path, self.model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _embed(self, texts):
+        batch = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                               return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), self.config["dim"]), dtype=np.float32)
+        # Longest first, like SentenceTransformer, so each batch pads little
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._embed([texts[i] for i in idx])
+        if normalize_embeddings or self.config["normalize"]:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+def load_encoder(name: str) -> OnnxEncoder:
+    path = model_dir(name)
+    if not os.path.isfile(os.path.join(path, CONFIG_FILE)):
+        raise RuntimeError(f"No ONNX export of {name} in {path}; run `python -m db.onnx_encoder export`")
+    return OnnxEncoder(path)
+
+
+def export(name: str, out_dir: str, quantize: bool = True, reduce_range: bool = False, opset: int = 17):
+    """Export `name`'s transformer to out_dir/model.onnx (+ model_int8.onnx) with its tokenizer."""
+    import inspect
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(name, device="cpu")
+    os.makedirs(out_dir, exist_ok=True)
+    st.tokenizer.save_pretrained(out_dir)
+
+    class Encoder(torch.nn.Module):
+        # Keyword call: positional forward() arguments differ across transformers versions
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    model = Encoder(st[0].auto_model).eval()
+    sample = st.tokenizer(["query: export sample", "passage: a somewhat longer export sample"],
+                          padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask"]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    # Newer torch defaults to the dynamo exporter, which ignores dynamic_axes
+    options = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(model, (sample["input_ids"], sample["attention_mask"]), fp32_path,
+                          input_names=names, output_names=["last_hidden_state"], dynamic_axes=dynamic,
+                          opset_version=opset, **options)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(out_dir, INT8_FILE), weight_type=QuantType.QInt8,
+                         per_channel=True, reduce_range=reduce_range)
+
+    config = {
+        "model": name,
+        "pooling": _pooling_mode(st[1]),
+        "normalize": any(type(m).__name__ == "Normalize" for m in st),
+        "max_seq_length": st.max_seq_length,
+        "dim": st.get_sentence_embedding_dimension(),
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def main(argv=None):
+    from db.embeddings import EMB_MODEL
+    parser = argparse.ArgumentParser(description="Export the embedding model for EMB_BACKEND=onnx.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="export to ONNX and quantize to int8")
+    exp.add_argument("--model", default=EMB_MODEL)
+    exp.add_argument("--out", default=None, help="output directory (default: ONNX_MODEL_DIR or db/.onnx/<model>)")
+    exp.add_argument("--no-quantize", action="store_true", help="only write the float32 model")
+    exp.add_argument("--reduce-range", action="store_true",
+                     help="7-bit weights; more accurate on CPUs without AVX512-VNNI")
+    exp.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args(argv)
+
+    out_dir = args.out or model_dir(args.model)
+    config = export(args.model, out_dir, quantize=not args.no_quantize,
+                    reduce_range=args.reduce_range, opset=args.opset)
+    sizes = {f: os.path.getsize(os.path.join(out_dir, f)) / 1e6 for f in (FP32_FILE, INT8_FILE)
+             if os.path.isfile(os.path.join(out_dir, f))}
+    print(f"[onnx] Exported {args.model} to {out_dir}: {config}")
+    for f, mb in sizes.items():
+        print(f"  {f}: {mb:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
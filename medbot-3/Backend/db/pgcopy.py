@@ -0,0 +1,67 @@
+# db/pgcopy.py
+"""
+Encoder for PostgreSQL's binary COPY format.
+
+Vectors go over the wire as float32 in pgvector's own binary layout
+(vector_recv). That avoids formatting each embedding as a text literal
+of 768 floats and having the server parse it back.
+
+Supported column types: text, int8, text[], vector.
+"""
+import io
+import struct
+import numpy as np
+
+_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_TRAILER = struct.pack("!h", -1)
+_NULL = struct.pack("!i", -1)
+TEXT_OID = 25
+
+
+def _text(value) -> bytes:
+    data = str(value).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def _int8(value) -> bytes:
+    return struct.pack("!iq", 8, int(value))
+
+
+def _text_array(values) -> bytes:
+    values = list(values or [])
+    if not values:
+        body = struct.pack("!iii", 0, 0, TEXT_OID)
+    else:
+        has_null = any(v is None for v in values)
+        body = struct.pack("!iiiii", 1, int(has_null), TEXT_OID, len(values), 1)
+        body += b"".join(_NULL if v is None else _text(v) for v in values)
+    return struct.pack("!i", len(body)) + body
+
+
+def _vector(values) -> bytes:
+    arr = np.asarray(values, dtype=">f4").ravel()
+    body = struct.pack("!hh", arr.shape[0], 0) + arr.tobytes()
+    return struct.pack("!i", len(body)) + body
+
+
+ENCODERS = {
+    "text": _text,
+    "int8": _int8,
+    "text[]": _text_array,
+    "vector": _vector,
+}
+
+
+def copy_buffer(rows, types) -> io.BytesIO:
+    """Binary COPY payload for `rows` (tuples) whose columns have `types`."""
+    encoders = [ENCODERS[t] for t in types]
+    buf = io.BytesIO()
+    buf.write(_HEADER)
+    field_count = struct.pack("!h", len(types))
+    for row in rows:
+        buf.write(field_count)
+        for enc, value in zip(encoders, row):
+            buf.write(_NULL if value is None else enc(value))
+    buf.write(_TRAILER)
+    buf.seek(0)
+    return buf
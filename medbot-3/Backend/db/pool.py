@@ -0,0 +1,99 @@
+# db/pool.py
+"""
+Process-wide Postgres connection pool shared by the API, the agent's
+in-process retrieval and the chatbot tools.
+
+ThreadedConnectionPool is used because FastAPI runs sync handlers on a
+threadpool; SimpleConnectionPool is not safe to share between threads.
+Sizes come from DB_POOL_MIN / DB_POOL_MAX.
+
+ThreadedConnectionPool raises PoolError the moment it is empty, so
+get_conn() waits on a semaphore for a free slot instead, for up to
+DB_POOL_TIMEOUT seconds, and then raises PoolTimeout. DB_POOL_MAX
+defaults to one connection per thread that can search at once: the
+default executor MedAgent routes on plus the agent's fan-out workers.
+pool_stats() (in /metrics) counts waits and timeouts.
+"""
+import os
+import time
+import threading
+import psycopg2
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+# asyncio's default executor size + chatbot.agent's FANOUT_WORKERS
+_SEARCH_THREADS = min(32, (os.cpu_count() or 1) + 4) + int(os.getenv("FANOUT_WORKERS", "8"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", str(_SEARCH_THREADS)))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+db_pool = None
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_stats_lock = threading.Lock()
+_stats = {"acquired": 0, "waited": 0, "timeouts": 0, "wait_ms_max": 0.0}
+
+
+class PoolTimeout(pool.PoolError):
+    """No connection became free within DB_POOL_TIMEOUT."""
+
+
+def get_pool():
+    """Create the pool on first use so importing this module never connects."""
+    global db_pool
+    if db_pool is None:
+        with _lock:
+            if db_pool is None:
+                db_pool = pool.ThreadedConnectionPool(
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    dsn=DATABASE_URL
+                )
+    return db_pool
+
+
+def _count(key: str, wait_ms: float = 0.0):
+    with _stats_lock:
+        _stats[key] += 1
+        _stats["wait_ms_max"] = max(_stats["wait_ms_max"], wait_ms)
+
+
+def get_conn(timeout: float = DB_POOL_TIMEOUT):
+    """A pooled connection, waiting up to `timeout` seconds for one to be released."""
+    if not _slots.acquire(blocking=False):
+        start = time.perf_counter()
+        acquired = _slots.acquire(timeout=timeout)
+        wait_ms = 1000 * (time.perf_counter() - start)
+        if not acquired:
+            _count("timeouts", wait_ms)
+            raise PoolTimeout(f"No database connection free after {timeout:.1f}s (DB_POOL_MAX={DB_POOL_MAX})")
+        _count("waited", wait_ms)
+    try:
+        conn = get_pool().getconn()
+    except psycopg2.Error as e:
+        _slots.release()
+        raise Exception(f"Database connection failed: {e}")
+    _count("acquired")
+    return conn
+
+
+def release_conn(conn):
+    if conn:
+        get_pool().putconn(conn)
+        _slots.release()
+
+
+def pool_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {"open": db_pool is not None, "max": DB_POOL_MAX, "timeout_s": DB_POOL_TIMEOUT, **stats}
+
+
+def close_pool():
+    global db_pool
+    with _lock:
+        if db_pool is not None:
+            db_pool.closeall()
+            db_pool = None
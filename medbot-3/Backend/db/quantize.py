@@ -0,0 +1,82 @@
+# db/quantize.py
+"""
+Compact in-memory representations of an L2-normalized embedding matrix.
+
+    float32   4 bytes/dim, exact
+    float16   2 bytes/dim, scores within ~1e-3 of float32
+    int8      1 byte/dim + one float32 scale per row (symmetric, per-row)
+    binary    1 bit/dim (sign), Hamming distance; only useful as a
+              candidate generator followed by a float re-rank
+
+Scoring converts fixed-size row blocks to float32 before the dot product,
+so the transient float copy is bounded by SCORE_BLOCK_ROWS regardless of
+table size.
+"""
+import os
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+SCORE_BLOCK_ROWS = int(os.getenv("INDEX_SCORE_BLOCK_ROWS", "8192"))
+
+
+class QuantizedMatrix:
+    """Row matrix stored as float32, float16 or int8 (with per-row scales)."""
+
+    __slots__ = ("dtype", "data", "scale")
+
+    def __init__(self, matrix, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported index dtype: {dtype} (expected one of {DTYPES})")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.dtype = dtype
+        self.scale = None
+        if dtype == "int8":
+            scale = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.empty(0, dtype=np.float32)
+            scale = np.maximum(scale, 1e-12).astype(np.float32)
+            self.data = np.ascontiguousarray(np.round(matrix / scale[:, None]).astype(np.int8))
+            self.scale = scale
+        else:
+            self.data = np.ascontiguousarray(matrix.astype(dtype, copy=False))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, q) -> np.ndarray:
+        """Dot product of every row with the float32 query `q`."""
+        q = np.asarray(q, dtype=np.float32).ravel()
+        if self.dtype == "float32":
+            return self.data @ q
+        out = np.empty(len(self.data), dtype=np.float32)
+        for start in range(0, len(self.data), SCORE_BLOCK_ROWS):
+            block = self.data[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ q
+        if self.scale is not None:
+            out *= self.scale
+        return out
+
+
+def binary_codes(matrix) -> np.ndarray:
+    """Sign bits packed 8 per byte (pgvector binary_quantize equivalent)."""
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming(codes: np.ndarray, q_code: np.ndarray) -> np.ndarray:
+    """Hamming distance from every packed row in `codes` to `q_code`."""
+    return _POPCOUNT[np.bitwise_xor(codes, q_code)].sum(axis=1, dtype=np.int32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    return top[np.argsort(-scores[top])]
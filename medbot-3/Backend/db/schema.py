@@ -0,0 +1,402 @@
+# db/schema.py
+"""
+Single source of truth for the database schema.
+
+All four retrieval tables (faqs, schemes, symptoms, risks) are declared
+once here with the same id type, vector dimension, language and
+content-hash columns. migrate() applies pending versioned migrations
+(recorded in schema_migrations) and then ensures the ANN indexes;
+check() compares the live database against these declarations and
+returns a list of drift problems, which the API uses to fail fast at
+startup instead of erroring on every lookup.
+
+    python -m db.schema migrate     # create / upgrade
+    python -m db.schema check       # report drift, exit 1 if any
+
+Every table also carries a generated `search_text` column (the texts in
+LEXICAL_COLUMNS, schemes.keywords included) with a trigram GIN index, and
+a stored `search_tsv` tsvector of the same text with a full-text GIN
+index, used by the hybrid lexical + vector search. lexical_stopwords lists
+each table's lexemes that occur in more than LEXICAL_STOPWORD_RATIO of its
+rows; searches drop them from the query so the full-text index narrows
+the match (refresh_lexical_stopwords() after loading data).
+
+table_generations holds one counter per table, bumped by a statement-level
+trigger on every write, so in-memory indexes (db/db_utils.py) detect
+changes with a primary-key lookup instead of scanning the table.
+
+The vector dimension comes from EMB_DIM (default 768, multilingual-e5-base).
+SCHEMA_CHECK=strict|warn|off controls what API startup does on drift.
+"""
+import os
+import sys
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+from db.indexes import (EMB_DIM, EMBEDDING_TABLES, ensure_indexes, existing_index, index_languages,
+                        index_name, opclass)
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict").lower()
+# Lexemes in more than this share of a table's rows (and at least
+# LEXICAL_STOPWORD_MIN_DOCS rows) are left out of full-text queries
+LEXICAL_STOPWORD_RATIO = float(os.getenv("LEXICAL_STOPWORD_RATIO", "0.05"))
+LEXICAL_STOPWORD_MIN_DOCS = int(os.getenv("LEXICAL_STOPWORD_MIN_DOCS", "20"))
+
+# table -> [(column, type)]; "id" gets its identity/primary key in _create_sql
+def table_columns(dim: int = EMB_DIM) -> dict:
+    common_tail = [("content_hash", "text"), ("embedding", f"vector({dim})")]
+    return {
+        "faqs": [("id", "bigint"), ("query", "text"), ("intent", "text"), ("entity", "text"),
+                 ("answer", "text"), ("language", "text"), ("source", "text")] + common_tail,
+        "schemes": [("id", "bigint"), ("scheme_name_en", "text"), ("scheme_name_hi", "text"),
+                    ("scheme_name_hinglish", "text"), ("purpose_en", "text"), ("purpose_hi", "text"),
+                    ("purpose_hinglish", "text"), ("keywords", "text[]")] + common_tail,
+        "symptoms": [("id", "bigint"), ("symptom", "text"), ("answer", "text"),
+                     ("language", "text"), ("source", "text")] + common_tail,
+        "risks": [("id", "bigint"), ("risk", "text"), ("answer", "text"),
+                  ("language", "text"), ("source", "text")] + common_tail,
+    }
+
+# The text each row is searched by; rows without it are never loaded
+NOT_NULL = {"faqs": "query", "symptoms": "symptom", "risks": "risk"}
+
+
+def _create_sql(table: str, columns) -> str:
+    defs = []
+    for name, typ in columns:
+        if name == "id":
+            # explicit ids (e.g. dataset ids for symptoms) and generated ids both work
+            defs.append("id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY")
+            continue
+        col = f"{name} {typ.upper() if typ in ('text', 'text[]') else typ}"
+        if NOT_NULL.get(table) == name:
+            col += " NOT NULL"
+        defs.append(col)
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(defs) + "\n);"
+
+
+def _content_hash_index_sql(table: str) -> str:
+    return f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_content_hash ON {table} (content_hash);"
+
+
+def _baseline(dim: int):
+    """
+    v1: every table in its final shape. Tables that already exist (legacy
+    loaders) are left alone here; v2 adds their missing columns and the
+    content_hash unique index.
+    """
+    stmts = ["CREATE EXTENSION IF NOT EXISTS vector;"]
+    for table, columns in table_columns(dim).items():
+        stmts.append(_create_sql(table, columns))
+    return stmts
+
+
+def _backfill_content_hash(table: str):
+    """
+    Hash rows loaded before content_hash existed the way db/load_data does,
+    so re-running the loader skips them instead of inserting duplicates.
+    Rows whose content repeats an earlier row keep a NULL hash (the unique
+    index would reject them otherwise) and are reported.
+    """
+    def run(cur):
+        from db.ingest import content_hash
+        from db.load_data import ROW_BUILDERS
+        spec, build_row = ROW_BUILDERS[table]
+        names = [c for c, _ in spec["columns"]]
+        select = names if "id" in names else ["id"] + names
+        cur.execute(f"SELECT content_hash FROM {table} WHERE content_hash IS NOT NULL;")
+        seen = {r[0] for r in cur.fetchall()}
+        cur.execute(f"SELECT {', '.join(select)} FROM {table} WHERE content_hash IS NULL ORDER BY id;")
+        updates, repeated = [], 0
+        for row in cur.fetchall():
+            item = dict(zip(select, row))
+            built = build_row(item)
+            if not built:
+                continue
+            h = content_hash(table, built[0], built[1])
+            if h in seen:
+                repeated += 1
+                continue
+            seen.add(h)
+            updates.append((h, item["id"]))
+        cur.executemany(f"UPDATE {table} SET content_hash = %s WHERE id = %s;", updates)
+        if updates or repeated:
+            print(f"[schema] {table}: hashed {len(updates)} existing row(s)"
+                  + (f", {repeated} duplicate(s) left unhashed" if repeated else ""))
+    return run
+
+
+def _align_legacy(dim: int):
+    """
+    v2: bring tables created by the old per-loader DDL (SERIAL ids, no
+    language/content_hash columns, no risks table) in line with v1, then
+    hash their existing rows before content_hash becomes unique.
+    """
+    stmts = []
+    for table, columns in table_columns(dim).items():
+        for name, typ in columns:
+            if name != "id":
+                stmts.append(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {typ};")
+        stmts.append(f"ALTER TABLE {table} ALTER COLUMN id TYPE BIGINT;")
+        stmts.append(_backfill_content_hash(table))
+        stmts.append(_content_hash_index_sql(table))
+    return stmts
+
+
+def _normalize_vectors(dim: int):
+    """
+    v3: searches use inner product, which only equals cosine similarity on
+    unit vectors. New rows are normalized at encode time; this rescales rows
+    loaded before that (l2_normalize needs pgvector >= 0.7).
+    """
+    return [f"UPDATE {table} SET embedding = l2_normalize(embedding) WHERE embedding IS NOT NULL;"
+            for table in table_columns(dim)]
+
+
+# table -> columns concatenated into search_text for lexical matching
+LEXICAL_COLUMNS = {
+    "faqs": ("query", "answer"),
+    "schemes": ("scheme_name_en", "scheme_name_hi", "scheme_name_hinglish",
+                "purpose_en", "purpose_hi", "purpose_hinglish", "keywords"),
+    "symptoms": ("symptom", "answer"),
+    "risks": ("risk", "answer"),
+}
+
+
+def search_text_expression(table: str, dim: int = EMB_DIM) -> str:
+    types = dict(table_columns(dim)[table])
+    parts = []
+    for col in LEXICAL_COLUMNS[table]:
+        # array_to_string is only STABLE, so arrays go through an IMMUTABLE wrapper
+        parts.append(f"search_keywords({col})" if types[col] == "text[]" else f"coalesce({col}, '')")
+    return " || ' ' || ".join(parts)
+
+
+def lexical_index_names(table: str):
+    return f"idx_{table}_search_tsv", f"idx_{table}_search_trgm"
+
+
+def _lexical_search(dim: int):
+    """
+    v4: generated search_text + GIN indexes for hybrid retrieval. The
+    'simple' text search config (no stemming, no stop words) is the one
+    that behaves the same for English, Hindi and Hinglish.
+    """
+    stmts = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        """CREATE OR REPLACE FUNCTION search_keywords(text[]) RETURNS text
+           LANGUAGE sql IMMUTABLE PARALLEL SAFE
+           AS $$ SELECT coalesce(array_to_string($1, ' '), '') $$;""",
+    ]
+    for table in table_columns(dim):
+        tsv, trgm = lexical_index_names(table)
+        stmts.append(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_text TEXT "
+                     f"GENERATED ALWAYS AS ({search_text_expression(table, dim)}) STORED;")
+        stmts.append(f"CREATE INDEX IF NOT EXISTS {tsv} ON {table} USING gin (to_tsvector('simple', search_text));")
+        stmts.append(f"CREATE INDEX IF NOT EXISTS {trgm} ON {table} USING gin (search_text gin_trgm_ops);")
+    return stmts
+
+
+def refresh_lexical_stopwords(cur, tables=None):
+    """Recompute each table's high-frequency lexemes from its stored search_tsv."""
+    for table in tables or table_columns():
+        cur.execute("DELETE FROM lexical_stopwords WHERE tbl = %s;", (table,))
+        cur.execute(f"""
+            INSERT INTO lexical_stopwords (tbl, word)
+            SELECT %s, word FROM ts_stat('SELECT search_tsv FROM {table}')
+            WHERE ndoc > GREATEST(%s * (SELECT count(*) FROM {table}), %s);
+        """, (table, LEXICAL_STOPWORD_RATIO, LEXICAL_STOPWORD_MIN_DOCS))
+
+
+def _stored_tsvector(dim: int):
+    """
+    v5: a stored search_tsv column replaces the to_tsvector() expression
+    index, so ranking reads the column instead of re-parsing search_text
+    per matched row, plus the lexical_stopwords table searches filter by.
+    """
+    stmts = ["""CREATE TABLE IF NOT EXISTS lexical_stopwords (
+                    tbl TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    PRIMARY KEY (tbl, word)
+                );"""]
+    for table in table_columns(dim):
+        tsv, _ = lexical_index_names(table)
+        # a generated column cannot reference search_text, so repeat its expression
+        stmts.append(f"DROP INDEX IF EXISTS {tsv};")
+        stmts.append(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS "
+                     f"(to_tsvector('simple', {search_text_expression(table, dim)})) STORED;")
+        stmts.append(f"CREATE INDEX IF NOT EXISTS {tsv} ON {table} USING gin (search_tsv);")
+    stmts.append(refresh_lexical_stopwords)
+    return stmts
+
+
+def _table_generations(dim: int):
+    """
+    v6: a per-table change counter. The trigger fires once per statement,
+    so a batched load bumps it once per batch, whoever the writer is.
+    """
+    stmts = [
+        """CREATE TABLE IF NOT EXISTS table_generations (
+               tbl TEXT PRIMARY KEY,
+               generation BIGINT NOT NULL DEFAULT 0
+           );""",
+        """CREATE OR REPLACE FUNCTION bump_table_generation() RETURNS trigger
+           LANGUAGE plpgsql AS $$
+           BEGIN
+               INSERT INTO table_generations (tbl, generation) VALUES (TG_TABLE_NAME, 1)
+               ON CONFLICT (tbl) DO UPDATE SET generation = table_generations.generation + 1;
+               RETURN NULL;
+           END $$;""",
+    ]
+    for table in table_columns(dim):
+        stmts.append(f"INSERT INTO table_generations (tbl) VALUES ('{table}') ON CONFLICT (tbl) DO NOTHING;")
+        stmts.append(f"DROP TRIGGER IF EXISTS {table}_generation ON {table};")
+        stmts.append(f"CREATE TRIGGER {table}_generation AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                     f"FOR EACH STATEMENT EXECUTE FUNCTION bump_table_generation();")
+    return stmts
+
+
+# (version, description, statements(dim)); a statement is SQL or a callable(cursor)
+MIGRATIONS = [
+    (1, "baseline: faqs, schemes, symptoms, risks", _baseline),
+    (2, "align tables created by legacy loaders", _align_legacy),
+    (3, "L2-normalize stored embeddings for inner-product search", _normalize_vectors),
+    (4, "search_text column with full-text and trigram indexes", _lexical_search),
+    (5, "stored search_tsv column and lexical_stopwords", _stored_tsvector),
+    (6, "table_generations change counters", _table_generations),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cur) -> int:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("SELECT COALESCE(max(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+
+def migrate(conn, dim: int = EMB_DIM, with_indexes: bool = True) -> int:
+    """Apply pending migrations (each in its own transaction), then ensure ANN indexes."""
+    with conn.cursor() as cur:
+        version = current_version(cur)
+    conn.commit()
+
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        with conn.cursor() as cur:
+            for stmt in statements(dim):
+                if callable(stmt):
+                    stmt(cur)
+                else:
+                    cur.execute(stmt)
+            cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                        (number, description))
+        conn.commit()
+        version = number
+        print(f"[schema] Applied migration {number}: {description}")
+
+    if with_indexes:
+        ensure_indexes(conn)
+    return version
+
+
+def check(conn, dim: int = EMB_DIM) -> list:
+    """Differences between the live database and the declared schema (empty list = no drift)."""
+    problems = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations');")
+        if cur.fetchone()[0] is None:
+            problems.append("schema_migrations table missing (run: python -m db.schema migrate)")
+        else:
+            cur.execute("SELECT COALESCE(max(version), 0) FROM schema_migrations;")
+            version = cur.fetchone()[0]
+            if version < SCHEMA_VERSION:
+                problems.append(f"schema version {version} < expected {SCHEMA_VERSION}")
+
+        for name in ("lexical_stopwords", "table_generations"):
+            cur.execute("SELECT to_regclass(%s);", (name,))
+            if cur.fetchone()[0] is None:
+                problems.append(f"{name} table missing")
+
+        for table, columns in table_columns(dim).items():
+            cur.execute("SELECT to_regclass(%s);", (table,))
+            if cur.fetchone()[0] is None:
+                problems.append(f"table {table} missing")
+                continue
+            cur.execute("""
+                SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+                FROM pg_attribute a
+                WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped;
+            """, (table,))
+            live = dict(cur.fetchall())
+            for name, typ in columns + [("search_text", "text"), ("search_tsv", "tsvector")]:
+                if name not in live:
+                    problems.append(f"{table}.{name} missing")
+                elif live[name] != typ:
+                    problems.append(f"{table}.{name} is {live[name]}, expected {typ}")
+
+            cur.execute("SELECT to_regclass(%s);", (f"idx_{table}_content_hash",))
+            content = cur.fetchone()[0]
+            for lang in (index_languages(table) if table in EMBEDDING_TABLES else []):
+                method, live_opclass = existing_index(cur, table, lang)
+                if method is None:
+                    problems.append(f"ANN index {index_name(table, lang)} missing")
+                elif live_opclass != opclass(table):
+                    problems.append(f"ANN index {index_name(table, lang)} uses {live_opclass}, "
+                                    f"expected {opclass(table)}")
+            if content is None:
+                problems.append(f"unique index idx_{table}_content_hash missing")
+            for name in lexical_index_names(table):
+                cur.execute("SELECT to_regclass(%s);", (name,))
+                if cur.fetchone()[0] is None:
+                    problems.append(f"lexical index {name} missing")
+    conn.rollback()
+    return problems
+
+
+def verify(conn, mode: str = SCHEMA_CHECK) -> list:
+    """Startup check: raise on drift in strict mode, log it in warn mode."""
+    if mode == "off":
+        return []
+    problems = check(conn)
+    for p in problems:
+        print(f"[schema] drift: {p}")
+    if problems and mode == "strict":
+        raise RuntimeError(f"Database schema drift ({len(problems)} problem(s)); "
+                           "run `python -m db.schema migrate` or set SCHEMA_CHECK=warn")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, upgrade or check the Arogyam schema.")
+    parser.add_argument("command", choices=["migrate", "check"])
+    parser.add_argument("--dim", type=int, default=EMB_DIM, help="embedding dimension")
+    parser.add_argument("--no-indexes", action="store_true", help="skip ANN index creation on migrate")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.command == "migrate":
+            version = migrate(conn, args.dim, with_indexes=not args.no_indexes)
+            print(f"[schema] At version {version}.")
+            return 0
+        problems = check(conn, args.dim)
+        for p in problems:
+            print(f"[schema] drift: {p}")
+        print(f"[schema] {'OK' if not problems else f'{len(problems)} problem(s)'}")
+        return 1 if problems else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
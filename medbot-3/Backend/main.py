@@ -1,22 +1,126 @@
+import time
+_import_started = time.perf_counter()
+
 import os
-import psycopg2
-from psycopg2 import pool
-from fastapi import FastAPI
+import json
+import asyncio
+import logging
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-from functools import lru_cache
 
 # 👇 Chatbot import
 from chatbot.chatbot import MedChatbot
+# 👇 Async retrieval service for the search endpoints (MedAgent uses the sync one in-process)
+from chatbot import retrieval_async
+from chatbot.retrieval import DEFAULT_TOP_K, resolve_language
+from chatbot.language import get_lexicon
+from db.pool import get_conn, release_conn, close_pool, pool_stats
+from db.embeddings import get_model, warm_up, batcher_stats
+from db.cache import cache_stats
+from db.async_pool import get_async_pool, close_async_pool, async_pool_stats
+from db import schema
+from chatbot.intent_router import get_router
 
 # Load env variables
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
+logger = logging.getLogger(__name__)
+
+# Tables whose db_utils in-memory index is loaded at startup (used by chatbot/tools)
+STARTUP_INDEXES = [t.strip() for t in os.getenv("STARTUP_INDEXES", "").split(",") if t.strip()]
+# 1 = open the port at once and warm up behind /ready (e.g. hosts with a short
+# boot timeout); 0 = serve nothing until warm-up is done
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "0") == "1"
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# Startup report served by /ready: seconds per warm-up step, in order
+startup = {"ready": False, "import_seconds": round(IMPORT_SECONDS, 3), "steps": {}, "error": None}
+
+# ✅ Global chatbot instance, built during warm-up
+chatbot: Optional[MedChatbot] = None
+
+
+def _step(name: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    startup["steps"][name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# Refuse to start against a database that doesn't match db/schema.py
+# (SCHEMA_CHECK=strict, the default), instead of failing on every lookup
+def check_schema():
+    conn = get_conn()
+    try:
+        schema.verify(conn)
+    finally:
+        release_conn(conn)
+
+
+def load_indexes():
+    from db import db_utils
+    for table in STARTUP_INDEXES:
+        db_utils.get_index(table).refresh(force=True)
+
+
+def warm_up_sync():
+    """Everything the first request would otherwise pay for, timed step by step."""
+    global chatbot
+    _step("schema_check", check_schema)          # also opens the sync DB pool
+    _step("embedding_model", get_model)
+    _step("warm_encode", warm_up)
+    _step("intent_centroids", get_router)
+    _step("language_lexicon", get_lexicon)
+    if STARTUP_INDEXES:
+        _step("in_memory_indexes", load_indexes)
+    chatbot = _step("chatbot", MedChatbot)
+
+
+async def _step_async(name: str, fn):
+    start = time.perf_counter()
+    result = await fn()
+    startup["steps"][name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def warm_up_all():
+    # Blocking steps run off the event loop; the async pool must open on it
+    await asyncio.to_thread(warm_up_sync)
+    await _step_async("async_db_pool", get_async_pool)
+    startup["ready"] = True
+    logger.info(f"[startup] ready: import {IMPORT_SECONDS:.2f}s, warm-up {startup['steps']}")
+
+
+async def _warm_up_in_background():
+    try:
+        await warm_up_all()
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+        logger.exception("[startup] warm-up failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"[startup] main imported in {IMPORT_SECONDS:.2f}s")
+    task = None
+    if WARMUP_IN_BACKGROUND:
+        task = asyncio.create_task(_warm_up_in_background())
+    else:
+        await warm_up_all()
+    yield
+    if task is not None:
+        task.cancel()
+    await close_async_pool()
+    close_pool()
+
 
 # FastAPI app
-app = FastAPI(title="Arogyam Health Assistant API")
+app = FastAPI(title="Arogyam Health Assistant API", lifespan=lifespan)
 
 # ✅ Enable CORS
 app.add_middleware(
@@ -27,162 +131,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Connection Pool
-db_pool = pool.SimpleConnectionPool(
-    minconn=1,
-    maxconn=10,
-    dsn=DATABASE_URL
-)
-
-def get_conn():
-    try:
-        return db_pool.getconn()
-    except psycopg2.Error as e:
-        raise Exception(f"Database connection failed: {e}")
-
-def release_conn(conn):
-    if conn:
-        db_pool.putconn(conn)
-
-# Cached embedding model
-@lru_cache(maxsize=1)
-def get_model():
-    return SentenceTransformer("intfloat/multilingual-e5-base")
-
 # Request schema
 class QueryInput(BaseModel):
     query: str
+    k: int = DEFAULT_TOP_K
+    # en / hi / hinglish; omitted = detected from the query, "all" = no language filter
+    lang: Optional[str] = None
 
 # Chatbot request schema
 class ChatInput(BaseModel):
     user_id: str
     message: str
 
-# ✅ Global chatbot instance
-chatbot = MedChatbot()
+def get_chatbot() -> MedChatbot:
+    if chatbot is None:
+        raise HTTPException(status_code=503, detail="Warming up, try again shortly")
+    return chatbot
 
 # ---------------- Root ----------------
 @app.get("/")
 def home():
     return {"message": "✅ Arogyam Health Assistant API is running!"}
 
+# ---------------- Readiness ----------------
+# 200 once warm-up has finished and the database answers, 503 before that;
+# the body is the startup report either way
+@app.get("/ready")
+def ready():
+    if not startup["ready"]:
+        return JSONResponse(status_code=503, content=startup)
+    try:
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+        finally:
+            release_conn(conn)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={**startup, "error": f"database: {e}"})
+    return startup
+
 # ---------------- Chatbot ----------------
+# Async so a slow LLM holds no worker thread: lookups run in the threadpool,
+# the LLM call is awaited (bounded by LLM_TIMEOUT, see chatbot/llm_client.py)
 @app.post("/chat")
-def chat_endpoint(data: ChatInput):
-    response = chatbot.handle_message(data.message, data.user_id)
+async def chat_endpoint(data: ChatInput):
+    response = await get_chatbot().handle_message_async(data.message, data.user_id)
     return {"reply": response}
 
+# Streams the reply as NDJSON: {"delta": "..."} lines, then {"done": true}
+@app.post("/chat/stream")
+async def chat_stream_endpoint(data: ChatInput):
+    bot = get_chatbot()
+
+    async def ndjson():
+        async for chunk in bot.stream_message_async(data.message, data.user_id):
+            yield json.dumps({"delta": chunk}, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 # ---------------- FAQ ----------------
 @app.get("/faq")
-def faq_search_get(query: str):
-    model = get_model()
-    embedding = model.encode(query).tolist()
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT answer, 1 - (embedding <=> %s::vector) AS similarity
-                FROM faqs
-                ORDER BY similarity DESC
-                LIMIT 1;
-            """, (embedding,))
-            res = cur.fetchone()
-    finally:
-        release_conn(conn)
-
-    if res:
-        answer, similarity = res
-        return {"answer": answer, "similarity": float(similarity)}
-    return {"answer": "No FAQ found. Please consult a doctor.", "similarity": 0.0}
+async def faq_search_get(query: str, k: int = DEFAULT_TOP_K, lang: Optional[str] = None):
+    return await retrieval_async.faq_search(query, k, resolve_language(query, lang))
 
 @app.post("/faq")
-def faq_search_post(data: QueryInput):
-    return faq_search_get(data.query)
+async def faq_search_post(data: QueryInput):
+    return await faq_search_get(data.query, data.k, data.lang)
 
 # ---------------- Schemes ----------------
 @app.get("/schemes")
 @app.get("/scheme")  # alias
-def schemes_search_get(query: str):
-    model = get_model()
-    embedding = model.encode(query).tolist()
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT scheme_name_en, purpose_en, 1 - (embedding <=> %s::vector) AS similarity
-                FROM schemes
-                ORDER BY similarity DESC
-                LIMIT 3;
-            """, (embedding,))
-            results = cur.fetchall()
-    finally:
-        release_conn(conn)
-
-    if results:
-        return {"results": [
-            {"scheme_name": r[0], "purpose": r[1], "similarity": float(r[2])}
-            for r in results
-        ]}
-    return {"results": [], "message": "No schemes found. Please check government portals."}
+async def schemes_search_get(query: str, k: int = DEFAULT_TOP_K, lang: Optional[str] = None):
+    return await retrieval_async.schemes_search(query, k, resolve_language(query, lang))
 
 @app.post("/schemes")
 @app.post("/scheme")
-def schemes_search_post(data: QueryInput):
-    return schemes_search_get(data.query)
+async def schemes_search_post(data: QueryInput):
+    return await schemes_search_get(data.query, data.k, data.lang)
 
 # ---------------- Symptoms ----------------
 @app.get("/symptoms")
-def symptoms_search_get(query: str):
-    model = get_model()
-    embedding = model.encode(query).tolist()
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT symptom, answer, 1 - (embedding <=> %s::vector) AS similarity
-                FROM symptoms
-                ORDER BY similarity DESC
-                LIMIT 1;
-            """, (embedding,))
-            res = cur.fetchone()
-    finally:
-        release_conn(conn)
-
-    if res:
-        symptom, answer, similarity = res
-        return {"symptom": symptom, "answer": answer, "similarity": float(similarity)}
-    return {"symptom": None, "answer": "No symptom info found. Please consult a doctor.", "similarity": 0.0}
+async def symptoms_search_get(query: str, k: int = DEFAULT_TOP_K, lang: Optional[str] = None):
+    return await retrieval_async.symptoms_search(query, k, resolve_language(query, lang))
 
 @app.post("/symptoms")
-def symptoms_search_post(data: QueryInput):
-    return symptoms_search_get(data.query)
+async def symptoms_search_post(data: QueryInput):
+    return await symptoms_search_get(data.query, data.k, data.lang)
 
 # ---------------- Risks ----------------
 @app.get("/risks")
-def risks_search_get(query: str):
-    model = get_model()
-    embedding = model.encode(query).tolist()
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT risk, answer, 1 - (embedding <=> %s::vector) AS similarity
-                FROM risks
-                ORDER BY similarity DESC
-                LIMIT 1;
-            """, (embedding,))
-            res = cur.fetchone()
-    finally:
-        release_conn(conn)
-
-    if res:
-        risk, answer, similarity = res
-        return {"risk": risk, "answer": answer, "similarity": float(similarity)}
-    return {"risk": None, "answer": "No risk info found. Please consult a doctor.", "similarity": 0.0}
+async def risks_search_get(query: str, k: int = DEFAULT_TOP_K, lang: Optional[str] = None):
+    return await retrieval_async.risks_search(query, k, resolve_language(query, lang))
 
 @app.post("/risks")
-def risks_search_post(data: QueryInput):
-    return risks_search_get(data.query)
+async def risks_search_post(data: QueryInput):
+    return await risks_search_get(data.query, data.k, data.lang)
+
+# ---------------- Metrics ----------------
+@app.get("/metrics")
+def metrics():
+    agent = get_chatbot().agent
+    return {"embedding_batcher": batcher_stats(), "cache": cache_stats(), "db_pool": async_pool_stats(),
+            "sync_db_pool": pool_stats(), "sessions": agent.state.stats(),
+            "llm_cache": agent.completions.stats(), "llm": agent.llm.stats()}
 
 # ---------------- Consult doctor ----------------
 @app.get("/consult")